@@ -0,0 +1,79 @@
+"""Общее для команд замеров: таймер, перцентили и базовая линия.
+
+Команды ``bench_*`` меряют повторами, печатают медиану и хвост и
+сравнивают результаты с базовой линией в JSON: рост числа запросов —
+регрессия всегда, рост времени и памяти — сверх допуска ``tolerance``.
+"""
+import json
+import os
+import time
+
+from django.conf import settings
+
+
+# Шум таймера: меньшие разницы не считаются регрессией.
+MIN_DELTA_MS = 1.0
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def host():
+    """Имя хоста для тестового клиента, допустимое ``ALLOWED_HOSTS``."""
+    for name in settings.ALLOWED_HOSTS:
+        if name not in ('*', '') and not name.startswith('.'):
+            return name
+    return 'localhost'
+
+
+def timings(run, repeat, warmup=0):
+    """Время ``repeat`` вызовов ``run()`` в миллисекундах после прогрева."""
+    for _ in range(warmup):
+        run()
+    result = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        result.append((time.perf_counter() - started) * 1000)
+    return result
+
+
+def compare(results, baseline, tolerance, metrics=('p50_ms',),
+            min_delta_ms=MIN_DELTA_MS):
+    """Регрессии относительно базовой линии: список строк-описаний."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: запросов {previous["queries"]} → '
+                f'{current["queries"]}'
+            )
+        for metric in metrics:
+            limit = previous[metric] * (1 + tolerance)
+            if metric.endswith('_ms'):
+                limit = max(limit, previous[metric] + min_delta_ms)
+            if current[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {previous[metric]} → '
+                    f'{current[metric]}'
+                )
+    return regressions
+
+
+def save_baseline(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as stream:
+        json.dump(data, stream, ensure_ascii=False, indent=2)
+
+
+def load_baseline(path):
+    """Сохранённая базовая линия; ``None``, если её ещё нет."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
@@ -0,0 +1,187 @@
+"""Кэш страниц: инвалидация по поколениям.
+
+У каждой ленты есть счётчик поколения. Запись данных увеличивает
+счётчики затронутых лент, и закэшированные страницы этих лент
+перестают совпадать с текущим поколением. Остальные ленты не
+сбрасываются, а устаревшая копия остаётся в кэше до перестроения:
+её получают запросы, пока страницу перестраивает один из них.
+Декоратор считает попадания, промахи и устаревшие ответы.
+
+Те же поколения дают ETag (``generation_etag``), по которому браузер
+получает ``304``, не дожидаясь даже чтения страницы из кэша.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+from .routers import use_primary
+
+
+GENERATION_KEY = 'generation:{}'
+PAGE_KEY = 'generation_page:{}:{}'
+# Сколько ждать, пока страницу перестраивает другой запрос.
+REBUILD_WAIT = 2.0
+REBUILD_POLL = 0.05
+
+HIT, MISS, STALE = 'hit', 'miss', 'stale'
+
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def _record(name, outcome):
+    with _stats_lock:
+        _stats[name][outcome] += 1
+    metrics.record_cache(outcome)
+
+
+def cache_stats():
+    """Счётчики ``hit``/``miss``/``stale`` по представлениям."""
+    with _stats_lock:
+        return {
+            name: {outcome: counts[outcome] for outcome in (HIT, MISS, STALE)}
+            for name, counts in _stats.items()
+        }
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _initial_generation():
+    # Счётчик, вытесненный из кэша, не должен вернуться к старому
+    # значению, иначе снова станут актуальны давно устаревшие страницы.
+    return int(time.time() * 1000)
+
+
+def get_generations(*names):
+    """Текущие поколения лент в порядке ``names``."""
+    keys = [GENERATION_KEY.format(name) for name in names]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_generation(), None)
+            found[key] = cache.get(key)
+    return tuple(found[key] for key in keys)
+
+
+def bump_generation(*names):
+    """Сбрасывает кэш страниц указанных лент."""
+    for name in set(names):
+        key = GENERATION_KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), None)
+
+
+def invalidate(*names):
+    """Сбрасывает ленты сейчас и ещё раз после фиксации транзакции.
+
+    Повторный сброс нужен, чтобы страница, собранная параллельным
+    запросом до фиксации, не закрепилась в новом поколении.
+    """
+    bump_generation(*names)
+    transaction.on_commit(lambda: bump_generation(*names))
+
+
+def make_etag(*parts):
+    """Сильный ETag из значений, определяющих содержимое ответа."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def generation_etag(generations):
+    """``etag_func`` для ``condition``: поколения лент, пользователь, адрес.
+
+    ``generations`` — та же функция, что у ``generation_cache_page``.
+    """
+    def etag(request, *args, **kwargs):
+        stamp = get_generations(*generations(request, *args, **kwargs))
+        user = request.user.pk if request.user.is_authenticated else None
+        return make_etag(stamp, user, request.get_full_path())
+    return etag
+
+
+def _view_name(view):
+    return f'{view.__module__}.{view.__name__}'
+
+
+def _page_key(view, request):
+    user = request.user
+    variant = '{}:{}'.format(
+        user.pk if user.is_authenticated else '', request.get_full_path()
+    )
+    return PAGE_KEY.format(
+        _view_name(view),
+        hashlib.md5(variant.encode()).hexdigest(),
+    )
+
+
+def _cacheable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+def _wait_for(key, is_fresh):
+    deadline = time.monotonic() + REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REBUILD_POLL)
+        entry = cache.get(key)
+        if entry is not None and is_fresh(entry):
+            return entry
+    return None
+
+
+def generation_cache_page(generations, timeout=600, lock_timeout=10):
+    """Кэширует GET-ответы представления до смены поколения его лент.
+
+    ``generations(request, *args, **kwargs)`` возвращает имена лент,
+    от которых зависит страница. Промах перестраивает страницу только
+    в одном запросе; остальные получают устаревшую копию или ждут.
+    """
+    def decorator(view):
+        name = _view_name(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            stamp = get_generations(*generations(request, *args, **kwargs))
+            key = _page_key(view, request)
+            entry = cache.get(key)
+            if entry is not None and entry[0] == stamp:
+                _record(name, HIT)
+                return entry[1]
+            lock = f'{key}:lock'
+            if cache.add(lock, 1, lock_timeout):
+                _record(name, MISS)
+                try:
+                    with use_primary():
+                        response = view(request, *args, **kwargs)
+                    if _cacheable(response):
+                        cache.set(key, (stamp, response), timeout)
+                finally:
+                    cache.delete(lock)
+                return response
+            if entry is not None:
+                _record(name, STALE)
+                return entry[1]
+            entry = _wait_for(key, lambda entry: entry[0] == stamp)
+            if entry is not None:
+                _record(name, HIT)
+                return entry[1]
+            _record(name, MISS)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,34 @@
+"""SQLite, открывающий транзакции ``BEGIN IMMEDIATE``.
+
+Django начинает ``atomic`` с ``BEGIN`` (DEFERRED): блокировка на запись
+берётся только на первой записи. Если транзакция сначала читает, а
+другой процесс тем временем начал писать, SQLite не может повысить
+блокировку и сразу возвращает «database is locked», не дожидаясь
+``timeout``. С ``OPTIONS['transaction_mode'] = 'IMMEDIATE'`` блокировка
+берётся в начале транзакции, и ожидание работает.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    transaction_mode = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        mode = params.pop('transaction_mode', None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode должен быть одним из {TRANSACTION_MODES}'
+            )
+        self.transaction_mode = mode and mode.upper()
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache_backends import SQLiteCache
+
+
+COUNTER_KEY = 'bench:counter'
+
+
+def _backend(name, path):
+    if name == 'locmem':
+        return LocMemCache('bench', {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}})
+    return SQLiteCache(path, {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}})
+
+
+def _render(cost):
+    # Имитация промаха: столько же работы, сколько сборка страницы.
+    deadline = time.perf_counter() + cost
+    while time.perf_counter() < deadline:
+        pass
+    return 'x' * 2048
+
+
+def _worker(args):
+    name, path, ops, keys, miss_cost, seed = args
+    cache = _backend(name, path)
+    rnd = random.Random(seed)
+    hits = 0
+    started = time.perf_counter()
+    for _ in range(ops):
+        # Популярность страниц распределена по степенному закону.
+        key = f'page:{min(int(rnd.paretovariate(1.2)), keys)}'
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.set(key, _render(miss_cost), None)
+        # Счётчик поколения: в LocMemCache у каждого процесса свой.
+        cache.add(COUNTER_KEY, 0, None)
+        cache.incr(COUNTER_KEY)
+    return hits, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает LocMemCache и общий SQLiteCache под нагрузкой '
+        'из нескольких процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--ops', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument(
+            '--miss-ms', type=float, default=2.0,
+            help='Стоимость промаха (сборки страницы), мс.',
+        )
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        ops = options['ops']
+        context = multiprocessing.get_context('fork')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench_cache.sqlite3')
+            for name in ('locmem', 'sqlite'):
+                jobs = [
+                    (name, path, ops, options['keys'],
+                     options['miss_ms'] / 1000, seed)
+                    for seed in range(processes)
+                ]
+                started = time.perf_counter()
+                with context.Pool(processes) as pool:
+                    results = pool.map(_worker, jobs)
+                elapsed = time.perf_counter() - started
+                total = ops * processes
+                hits = sum(hit for hit, _ in results)
+                self.stdout.write(
+                    f'{name:>7}: {processes} процессов, '
+                    f'{total / elapsed:,.0f} оп/с, '
+                    f'попаданий {hits / total:.1%}'
+                )
+                if name == 'sqlite':
+                    counter = _backend(name, path).get(COUNTER_KEY)
+                    verdict = 'ok' if counter == total else 'РАСХОЖДЕНИЕ'
+                    self.stdout.write(
+                        f'         incr из всех процессов: {counter} '
+                        f'из {total} ({verdict})'
+                    )
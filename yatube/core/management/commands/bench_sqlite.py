@@ -0,0 +1,177 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+
+from core import bench
+from core.sqlite import pragma_statements
+
+
+SCHEMA = (
+    'CREATE TABLE post ('
+    ' id INTEGER PRIMARY KEY, text TEXT, comments_count INTEGER)',
+    'CREATE TABLE comment ('
+    ' id INTEGER PRIMARY KEY, post_id INTEGER, text TEXT, pub_date REAL)',
+    'CREATE INDEX comment_post ON comment (post_id, pub_date)',
+)
+POSTS = 1000
+
+
+def _profiles(settings_module):
+    """«До»: настройки Django по умолчанию; «после»: профиль продакшена."""
+    database = import_module(settings_module).DATABASES['default']
+    options = database.get('OPTIONS', {})
+    return {
+        'default': {
+            'pragmas': {},
+            'timeout': 5.0,
+            'begin': 'BEGIN',
+            'persistent': False,
+        },
+        'production': {
+            'pragmas': database.get('PRAGMAS', {}),
+            'timeout': options.get('timeout', 5.0),
+            'begin': 'BEGIN {}'.format(
+                options.get('transaction_mode', 'DEFERRED')
+            ),
+            'persistent': database.get('CONN_MAX_AGE', 0) != 0,
+        },
+    }
+
+
+def _connect(path, profile):
+    connection = sqlite3.connect(
+        path, timeout=profile['timeout'], isolation_level=None
+    )
+    for statement in pragma_statements(profile['pragmas']):
+        connection.execute(statement)
+    return connection
+
+
+def _read(connection, rnd):
+    # Страница поста: пост и последние комментарии.
+    post_id = rnd.randint(1, POSTS)
+    connection.execute(
+        'SELECT text, comments_count FROM post WHERE id = ?', (post_id,)
+    ).fetchone()
+    connection.execute(
+        'SELECT text FROM comment WHERE post_id = ? '
+        'ORDER BY pub_date DESC LIMIT 20',
+        (post_id,),
+    ).fetchall()
+
+
+def _write(connection, rnd, begin):
+    # add_comment: проверка поста, вставка, счётчик — одна транзакция.
+    post_id = rnd.randint(1, POSTS)
+    connection.execute(begin)
+    try:
+        connection.execute('SELECT id FROM post WHERE id = ?', (post_id,))
+        connection.execute(
+            'INSERT INTO comment (post_id, text, pub_date) VALUES (?, ?, ?)',
+            (post_id, 'комментарий', time.time()),
+        )
+        connection.execute(
+            'UPDATE post SET comments_count = comments_count + 1 '
+            'WHERE id = ?',
+            (post_id,),
+        )
+        connection.execute('COMMIT')
+    except sqlite3.OperationalError:
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        raise
+
+
+def _worker(args):
+    path, profile, requests, write_share, seed = args
+    rnd = random.Random(seed)
+    connection = _connect(path, profile) if profile['persistent'] else None
+    latencies = []
+    writes = errors = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        current = connection or _connect(path, profile)
+        try:
+            if rnd.random() < write_share:
+                _write(current, rnd, profile['begin'])
+                writes += 1
+            else:
+                _read(current, rnd)
+        except sqlite3.OperationalError:
+            errors += 1
+        finally:
+            if connection is None:
+                current.close()
+        latencies.append(time.perf_counter() - request_started)
+    return writes, errors, latencies, time.perf_counter() - started
+
+
+def _prepare(path, profile):
+    connection = _connect(path, profile)
+    for statement in SCHEMA:
+        connection.execute(statement)
+    connection.executemany(
+        'INSERT INTO post (id, text, comments_count) VALUES (?, ?, 0)',
+        [(post_id, f'пост {post_id}') for post_id in range(1, POSTS + 1)],
+    )
+    connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLite с настройками по умолчанию и профиль '
+        'продакшена (WAL, прагмы, постоянные подключения, BEGIN '
+        'IMMEDIATE) под конкурентными чтениями и записями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument(
+            '--write-share', type=float, default=0.2,
+            help='Доля запросов с записью (add_comment).',
+        )
+        parser.add_argument(
+            '--settings-module', default='yatube.settings_prod',
+            help='Откуда брать профиль продакшена.',
+        )
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        context = multiprocessing.get_context('fork')
+        profiles = _profiles(options['settings_module'])
+        for name, profile in profiles.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench_sqlite.sqlite3')
+                _prepare(path, profile)
+                jobs = [
+                    (path, profile, options['requests'],
+                     options['write_share'], seed)
+                    for seed in range(processes)
+                ]
+                started = time.perf_counter()
+                with context.Pool(processes) as pool:
+                    results = pool.map(_worker, jobs)
+                elapsed = time.perf_counter() - started
+            total = options['requests'] * processes
+            writes = sum(result[0] for result in results)
+            errors = sum(result[1] for result in results)
+            latencies = [
+                latency for result in results for latency in result[2]
+            ]
+            p99 = bench.percentile(latencies, .99) * 1000
+            self.stdout.write(
+                f'{name:>10}: {total / elapsed:,.0f} запросов/с, '
+                f'записей {writes / elapsed:,.0f}/с, '
+                f'«database is locked» {errors} ({errors / total:.1%}), '
+                f'медиана {statistics.median(latencies) * 1000:.2f} мс, '
+                f'p99 {p99:.2f} мс'
+            )
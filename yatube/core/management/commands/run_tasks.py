@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи очереди core.tasks в пуле потоков. Для '
+        'нескольких процессов запустите несколько команд: одну задачу '
+        'два воркера не возьмут.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Потоков, выполняющих задачи.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Секунд ожидания, когда очередь пуста.',
+        )
+
+    def handle(self, *args, **options):
+        done, failed = tasks.work(
+            concurrency=options['concurrency'],
+            once=options['once'],
+            poll_interval=options['poll_interval'],
+        )
+        self.stdout.write(f'выполнено задач: {done}, с ошибкой: {failed}')
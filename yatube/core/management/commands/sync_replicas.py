@@ -0,0 +1,59 @@
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def _path(name):
+    """Путь к файлу из NAME вида «file:/путь?mode=ro» или обычного пути."""
+    return urlsplit(name).path if name.startswith('file:') else name
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики DATABASE_REPLICAS '
+        'через backup API; с --interval повторяет копирование.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Секунд между копированиями; без него — один раз.',
+        )
+
+    def sync(self, source):
+        for alias in settings.DATABASE_REPLICAS:
+            started = time.perf_counter()
+            target = sqlite3.connect(
+                _path(connections[alias].settings_dict['NAME']), timeout=30
+            )
+            try:
+                source.backup(target)
+                # Реплики открываются только для чтения: без WAL им не
+                # нужен файл -shm, который читатель не смог бы создать.
+                target.execute('PRAGMA journal_mode = delete')
+            finally:
+                target.close()
+            self.stdout.write(
+                f'{alias}: {(time.perf_counter() - started) * 1000:.0f} мс'
+            )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite' or not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Нужна основная база SQLite и хотя бы одна реплика '
+                '(YATUBE_REPLICAS)'
+            )
+        source = sqlite3.connect(_path(primary.settings_dict['NAME']))
+        try:
+            while True:
+                self.sync(source)
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            source.close()
@@ -0,0 +1,228 @@
+"""Метрики запросов: время, запросы к базе, кэш и шаблоны.
+
+``MetricsMiddleware`` заводит на каждый запрос ``RequestMetrics`` и
+кладёт его в контекстную переменную. Обёртка ``execute_wrapper`` считает
+запросы к базе, бэкенд шаблонов ``core.template_backends`` — время
+рендера, а ``core.cache`` — попадания и промахи кэша страниц. После
+ответа значения попадают в гистограммы по имени представления и в
+заголовок ``Server-Timing``.
+
+Гистограммы живут в памяти процесса (у каждого воркера свои) и
+отдаются представлением ``core.views.metrics`` в текстовом формате
+Prometheus. На запрос приходится несколько вызовов ``perf_counter`` и
+одна короткая блокировка, поэтому middleware можно не выключать.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+# Верхние границы корзин гистограмм.
+TIME_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+HISTOGRAMS = {
+    'request_duration_ms': TIME_BUCKETS,
+    'db_duration_ms': TIME_BUCKETS,
+    'template_duration_ms': TIME_BUCKETS,
+    'db_queries': QUERY_BUCKETS,
+}
+UNRESOLVED = '<unresolved>'
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Пары (граница, число наблюдений не больше неё), как в Prometheus.
+        """
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+        self.cache = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обёртка для connection.execute_wrapper.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_queries += 1
+
+    def server_timing(self):
+        parts = [
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.db_queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+        ]
+        parts.extend(
+            f'cache;desc="{outcome}"' for outcome in sorted(self.cache)
+        )
+        parts.append(f'total;dur={self.duration * 1000:.1f}')
+        return ', '.join(parts)
+
+
+class Registry:
+    """Гистограммы и счётчики кэша по именам представлений."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = defaultdict(lambda: {
+                name: Histogram(buckets)
+                for name, buckets in HISTOGRAMS.items()
+            })
+            self.cache = defaultdict(Counter)
+
+    def observe(self, view, metrics):
+        values = {
+            'request_duration_ms': metrics.duration * 1000,
+            'db_duration_ms': metrics.db_time * 1000,
+            'template_duration_ms': metrics.template_time * 1000,
+            'db_queries': metrics.db_queries,
+        }
+        with self._lock:
+            histograms = self.histograms[view]
+            for name, value in values.items():
+                histograms[name].observe(value)
+            self.cache[view].update(metrics.cache)
+
+    def snapshot(self):
+        """Копия данных для выдачи, чтобы не держать блокировку."""
+        with self._lock:
+            return {
+                view: {
+                    'histograms': {
+                        name: {
+                            'buckets': list(histogram.cumulative()),
+                            'sum': histogram.sum,
+                            'count': histogram.count,
+                        }
+                        for name, histogram in histograms.items()
+                    },
+                    'cache': dict(self.cache[view]),
+                }
+                for view, histograms in self.histograms.items()
+            }
+
+
+registry = Registry()
+
+
+def current():
+    """Замеры текущего запроса или ``None`` вне запроса."""
+    return _current.get()
+
+
+def record_cache(outcome):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache[outcome] += 1
+
+
+@contextmanager
+def template_timer():
+    """Считает время рендера; вложенный рендер не учитывается дважды."""
+    metrics = _current.get()
+    if metrics is None or metrics.rendering:
+        yield
+        return
+    metrics.rendering = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.rendering = False
+        metrics.template_time += time.perf_counter() - started
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"')
+
+
+def prometheus(snapshot, prefix='yatube'):
+    """Текстовый формат Prometheus для ``Registry.snapshot()``."""
+    lines = []
+    for name in HISTOGRAMS:
+        metric = f'{prefix}_{name}'
+        lines.append(f'# TYPE {metric} histogram')
+        for view, data in sorted(snapshot.items()):
+            histogram = data['histograms'][name]
+            label = f'view="{_escape(view)}"'
+            for bound, count in histogram['buckets']:
+                lines.append(
+                    f'{metric}_bucket{{{label},le="{bound}"}} {count}'
+                )
+            lines.append(f'{metric}_sum{{{label}}} {histogram["sum"]:.3f}')
+            lines.append(f'{metric}_count{{{label}}} {histogram["count"]}')
+    metric = f'{prefix}_page_cache_total'
+    lines.append(f'# TYPE {metric} counter')
+    for view, data in sorted(snapshot.items()):
+        for outcome, count in sorted(data['cache'].items()):
+            lines.append(
+                f'{metric}{{view="{_escape(view)}",outcome="{outcome}"}} '
+                f'{count}'
+            )
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """Замеряет запрос и добавляет заголовок ``Server-Timing``.
+
+    Ставится первым в ``MIDDLEWARE``, чтобы учесть и остальные
+    middleware. ``METRICS_SERVER_TIMING = False`` отключает заголовок.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        metrics.duration = time.perf_counter() - metrics.started
+        match = getattr(request, 'resolver_match', None)
+        registry.observe(match.view_name if match else UNRESOLVED, metrics)
+        if self.server_timing:
+            response['Server-Timing'] = metrics.server_timing()
+        return response
@@ -0,0 +1,187 @@
+"""Журнал медленных запросов и поиск N+1.
+
+``QueryInspector`` — обёртка ``connection.execute_wrapper``. Запрос
+дольше ``SLOW_QUERY_MS`` пишется в лог ``core.querylog`` вместе с
+представлением, строкой кода и строкой шаблона, откуда он пришёл.
+Если в одном запросе страницы SELECT одной формы (SQL без значений
+параметров) выполняется ``NPLUSONE_REPEAT_LIMIT`` раз, это N+1:
+в продакшене он пишется в лог, а в строгом режиме (тестовый прогон,
+``inspect_queries(strict=True)``) поднимает ``NPlusOneError``.
+
+Формы запросов считает только часть запросов страниц
+(``NPLUSONE_SAMPLE_RATE``), медленные запросы проверяются всегда: это
+одно сравнение времени. Стек разбирается, только когда есть что
+записать.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = 100
+NPLUSONE_REPEAT_LIMIT = 5
+NPLUSONE_SAMPLE_RATE = 0.05
+SQL_PREVIEW = 300
+
+# «IN (%s, %s, %s)» разной длины — одна и та же форма запроса.
+PLACEHOLDERS = re.compile(r'%s(?:\s*,\s*%s)+')
+DJANGO_ROOT = os.path.dirname(os.path.dirname(
+    sys.modules['django'].__file__
+))
+PROJECT_ROOT = settings.BASE_DIR
+# Обёртки замеров не бывают источником запроса.
+SKIPPED_FILES = {
+    os.path.join(os.path.dirname(__file__), name)
+    for name in ('querylog.py', 'metrics.py', 'template_backends.py')
+}
+
+
+class NPlusOneError(AssertionError):
+    """Повторяющиеся запросы одной формы в строгом режиме."""
+
+
+def query_shape(sql):
+    return PLACEHOLDERS.sub('%s', sql)
+
+
+def origin():
+    """Строка кода проекта и строка шаблона, откуда выполнен запрос."""
+    code = template = None
+    frame = sys._getframe(1)
+    while frame is not None and (code is None or template is None):
+        filename = frame.f_code.co_filename
+        node = frame.f_locals.get('self')
+        if (
+            template is None
+            and frame.f_code.co_name == 'render_annotated'
+            and getattr(node, 'origin', None) is not None
+        ):
+            name = node.origin.template_name or node.origin.name
+            template = f'{name}:{node.token.lineno}'
+        elif (
+            code is None
+            and filename.startswith(PROJECT_ROOT)
+            and not filename.startswith(DJANGO_ROOT)
+            and filename not in SKIPPED_FILES
+        ):
+            code = '{}:{} in {}'.format(
+                os.path.relpath(filename, PROJECT_ROOT),
+                frame.f_lineno, frame.f_code.co_name,
+            )
+        frame = frame.f_back
+    return code, template
+
+
+def _describe(code, template):
+    return ', '.join(
+        part for part in (code, template and f'шаблон {template}') if part
+    ) or 'неизвестно откуда'
+
+
+class QueryInspector:
+    """Пишет медленные запросы и ищет N+1 внутри одного запроса страницы.
+
+    ``view`` — имя представления или функция, возвращающая его, когда
+    URL уже разобран.
+    """
+
+    def __init__(self, view=None, track_repeats=True, strict=False,
+                 slow_ms=None, repeat_limit=None):
+        self.view = view
+        self.track_repeats = track_repeats
+        self.strict = strict
+        self.slow_ms = (
+            getattr(settings, 'SLOW_QUERY_MS', SLOW_QUERY_MS)
+            if slow_ms is None else slow_ms
+        )
+        self.repeat_limit = repeat_limit or getattr(
+            settings, 'NPLUSONE_REPEAT_LIMIT', NPLUSONE_REPEAT_LIMIT
+        )
+        self.shapes = Counter()
+        self.repeated = []
+
+    @property
+    def view_name(self):
+        view = self.view() if callable(self.view) else self.view
+        return view or '-'
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            if elapsed >= self.slow_ms:
+                self._slow(sql, params, elapsed)
+        if self.track_repeats and not many:
+            self._count(sql)
+        return result
+
+    def _slow(self, sql, params, elapsed):
+        logger.warning(
+            'Медленный запрос %.1f мс в %s (%s): %s; параметры %r',
+            elapsed, self.view_name, _describe(*origin()),
+            sql[:SQL_PREVIEW], params,
+        )
+
+    def _count(self, sql):
+        if not sql.lstrip()[:6].upper() == 'SELECT':
+            return
+        shape = query_shape(sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] != self.repeat_limit:
+            return
+        message = '{} одинаковых запросов в {} ({}): {}'.format(
+            self.repeat_limit, self.view_name, _describe(*origin()),
+            shape[:SQL_PREVIEW],
+        )
+        self.repeated.append(message)
+        if self.strict:
+            raise NPlusOneError(f'N+1: {message}')
+        logger.warning('N+1: %s', message)
+
+
+@contextmanager
+def inspect_queries(**options):
+    """Проверяет запросы всех подключений внутри блока ``with``."""
+    inspector = QueryInspector(**options)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(inspector))
+        yield inspector
+
+
+class QueryLogMiddleware:
+    """Журнал медленных запросов и N+1 для каждого запроса страницы.
+
+    ``NPLUSONE_STRICT = True`` (так запускаются тесты) проверяет каждый
+    запрос и превращает N+1 в ошибку.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.strict = getattr(settings, 'NPLUSONE_STRICT', False)
+        self.sample_rate = getattr(
+            settings, 'NPLUSONE_SAMPLE_RATE', NPLUSONE_SAMPLE_RATE
+        )
+
+    def __call__(self, request):
+        def view_name():
+            match = getattr(request, 'resolver_match', None)
+            return match.view_name if match else request.path
+
+        track = self.strict or random.random() < self.sample_rate
+        with inspect_queries(
+            view=view_name, track_repeats=track, strict=self.strict
+        ):
+            return self.get_response(request)
@@ -0,0 +1,183 @@
+"""Ограничение частоты записей: token bucket по пользователю и IP.
+
+``@rate_limit('post_create', user='10/m', ip='60/m')`` даёт каждому
+пользователю и каждому адресу ведро на 10 (60) жетонов, которое
+пополняется с той же скоростью за минуту. Запрос без жетона получает
+``429`` с ``Retry-After``.
+
+Ведро адреса проверяется первым и не требует ничего, кроме
+``REMOTE_ADDR``, — поток запросов с одного адреса отсекается до сессии
+и любой работы с базой. Ведро пользователя проверяется следом: для него
+нужен ``request.user`` (сессия), но до запросов самого представления и
+до записи. Анонимные запросы проверяются только по адресу.
+
+Лимиты в коде — значения по умолчанию; ``RATE_LIMITS`` в настройках
+переопределяет их по имени области (``None`` отключает ведро).
+Хранилище выбирает ``RATE_LIMIT_STORE``: ``memory`` — словарь в памяти
+процесса, ``cache`` — кэш Django, общий для воркеров. Проверка берёт
+жетон из каждого включённого ведра: чтение и запись ведра адреса и,
+для вошедшего пользователя, ещё одни чтение и запись ведра
+пользователя (если адрес пропущен). Стоимость не зависит от числа
+клиентов.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+
+# Ведер в памяти процесса не больше: давно не встречавшиеся вытесняются.
+MEMORY_MAX_KEYS = 100000
+CACHE_KEY = 'ratelimit:{}'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """``'10/m'`` → (10 жетонов, 10 / 60 жетона в секунду)."""
+    count, _, period = rate.partition('/')
+    try:
+        capacity = int(count)
+        seconds = PERIODS[period]
+    except (KeyError, ValueError):
+        raise ValueError(
+            f'Лимит {rate!r}: ожидается «число/период», период из '
+            + ', '.join(PERIODS)
+        )
+    return capacity, capacity / seconds
+
+
+def take(bucket, now, capacity, refill):
+    """Берёт жетон из ведра ``(жетонов, время)``.
+
+    Возвращает новое ведро и сколько секунд ждать, если жетона нет.
+    """
+    tokens, updated = bucket or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * refill)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / refill
+
+
+class MemoryStore:
+    """Вёдра в памяти процесса: у каждого воркера свои лимиты."""
+    name = 'memory'
+
+    def __init__(self, max_keys=MEMORY_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill):
+        with self._lock:
+            bucket, wait = take(
+                self._buckets.get(key), time.monotonic(), capacity, refill
+            )
+            self._buckets[key] = bucket
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheStore:
+    """Вёдра в кэше Django, общие для всех воркеров.
+
+    Чтение и запись ведра не атомарны: одновременные запросы одного
+    клиента из разных воркеров могут получить на жетон-другой больше.
+    Для защиты от потока записей этого достаточно.
+    """
+    name = 'cache'
+
+    def consume(self, key, capacity, refill):
+        key = CACHE_KEY.format(key)
+        bucket, wait = take(cache.get(key), time.time(), capacity, refill)
+        # Через столько секунд ведро было бы полным и без записи.
+        cache.set(key, bucket, int(capacity / refill) + 1)
+        return wait
+
+    def clear(self):
+        # Ключи вёдер не перечислить: они сами истекают.
+        pass
+
+
+STORES = {
+    MemoryStore.name: MemoryStore,
+    CacheStore.name: CacheStore,
+}
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    name = getattr(settings, 'RATE_LIMIT_STORE', MemoryStore.name)
+    with _stores_lock:
+        if name not in _stores:
+            _stores[name] = STORES[name]()
+        return _stores[name]
+
+
+def client_ip(request):
+    """Адрес клиента; за прокси — последний в ``X-Forwarded-For``."""
+    header = getattr(settings, 'RATE_LIMIT_IP_HEADER', None)
+    if header and request.META.get(header):
+        return request.META[header].split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def limits(scope, defaults):
+    configured = getattr(settings, 'RATE_LIMITS', {}).get(scope, {})
+    return dict(defaults, **configured)
+
+
+def check(request, scope, user=None, ip=None):
+    """Секунды до следующего жетона или ``0``, если запрос пропущен."""
+    rates = limits(scope, {'ip': ip, 'user': user})
+    store = get_store()
+    if rates['ip']:
+        wait = store.consume(
+            f'{scope}:ip:{client_ip(request)}', *parse_rate(rates['ip'])
+        )
+        if wait:
+            return wait
+    if rates['user'] and request.user.is_authenticated:
+        return store.consume(
+            f'{scope}:user:{request.user.pk}', *parse_rate(rates['user'])
+        )
+    return 0
+
+
+def too_many_requests(wait):
+    response = HttpResponse(
+        'Слишком много запросов, попробуйте позже.',
+        status=429,
+        content_type='text/plain; charset=utf-8',
+    )
+    response['Retry-After'] = max(1, round(wait))
+    return response
+
+
+def rate_limit(scope, user=None, ip=None, methods=('POST',)):
+    """Ограничивает частоту запросов ``methods`` к представлению.
+
+    ``methods=None`` считает запросы любым методом. Ставится над
+    ``login_required``, чтобы ведро адреса проверялось до сессии.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                wait = check(request, scope, user, ip)
+                if wait:
+                    return too_many_requests(wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
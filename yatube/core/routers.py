@@ -0,0 +1,107 @@
+"""Чтение с реплик и запись в основную базу.
+
+``ReplicaRouter`` отправляет чтения на случайную реплику из
+``DATABASE_REPLICAS``, а записи — в ``default``. Реплики отстают, поэтому
+после записи клиент на ``REPLICA_PIN_SECONDS`` секунд «прилипает» к
+основной базе: ``ReplicaPinMiddleware`` ставит cookie, и все чтения с
+ним идут в ``default``. Так пользователь сразу видит свой новый пост
+или комментарий, а остальные читают реплики.
+
+Внутри запроса, выполнившего запись, внутри транзакции основной базы
+и в ``use_primary()`` чтения тоже идут в ``default``. Кэш страниц
+собирает страницы из основной базы, иначе отставшая реплика
+закрепила бы старую страницу в новом поколении. Без реплик роутер
+ничего не меняет.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_COOKIE = 'primary_until'
+REPLICA_PIN_SECONDS = 10
+
+# Читать ли из основной базы; запись включает до конца запроса.
+_pinned = ContextVar('pinned_to_primary', default=False)
+# Была ли запись в текущем запросе (тогда ставится cookie).
+_wrote = ContextVar('wrote_to_primary', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def use_primary():
+    """Читает из основной базы внутри блока ``with``."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if (
+            not aliases
+            or _pinned.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        _pinned.set(True)
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы.
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема реплик приходит копированием основной базы.
+        return db not in replicas()
+
+
+class ReplicaPinMiddleware:
+    """Держит чтения клиента на основной базе после его записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(
+            settings, 'REPLICA_PIN_SECONDS', REPLICA_PIN_SECONDS
+        )
+
+    def _pinned_by_cookie(self, request):
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def __call__(self, request):
+        pinned = _pinned.set(self._pinned_by_cookie(request))
+        wrote = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get() and replicas():
+                response.set_cookie(
+                    PIN_COOKIE,
+                    f'{time.time() + self.pin_seconds:.0f}',
+                    max_age=self.pin_seconds,
+                    httponly=True,
+                    samesite='Lax',
+                )
+            return response
+        finally:
+            _pinned.reset(pinned)
+            _wrote.reset(wrote)
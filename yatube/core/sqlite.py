@@ -0,0 +1,48 @@
+"""Настройка подключений SQLite для продакшена.
+
+Прагмы задаются ключом ``PRAGMAS`` в ``DATABASES`` и выполняются
+обработчиком ``connection_created`` при каждом новом подключении::
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'core.db_backends.sqlite3',
+            'NAME': '/var/lib/yatube/db.sqlite3',
+            'CONN_MAX_AGE': 600,
+            'OPTIONS': {'timeout': 5, 'transaction_mode': 'IMMEDIATE'},
+            'PRAGMAS': {'journal_mode': 'wal', 'synchronous': 'normal'},
+        }
+    }
+
+В режиме WAL читатели не ждут писателя, ``synchronous=normal``
+синхронизирует диск только на контрольных точках, а ``busy_timeout``
+заставляет писателя подождать блокировку, а не сразу получить
+«database is locked». Журнал WAL хранится в самом файле базы, поэтому
+``journal_mode`` достаточно выполнить один раз, но прагма дешёвая.
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+def pragma_statements(pragmas):
+    for name, value in pragmas.items():
+        value = str(value)
+        if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(value):
+            raise ImproperlyConfigured(
+                f'Недопустимая прагма SQLite: {name} = {value!r}'
+            )
+        yield f'PRAGMA {name} = {value}'
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик ``connection_created``: выполняет прагмы подключения."""
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(pragmas):
+            cursor.execute(statement)
@@ -0,0 +1,210 @@
+"""Очередь отложенных задач в таблице базы данных.
+
+Функция, объявленная через ``@task()``, ставится в очередь вызовом
+``.enqueue(*args, **kwargs)``: это одна вставка строки ``core.Task`` в
+той же транзакции, что и запись, которая её породила, поэтому задача
+не потеряется и не выполнится раньше фиксации. Аргументы хранятся в
+JSON, так что передавать нужно идентификаторы, а не объекты.
+
+Пока задача с ``dedupe_key`` ждёт в очереди, вторая с тем же ключом не
+ставится: десять правок поста подряд дадут одну переиндексацию.
+
+Задачи выполняет команда ``run_tasks`` в пуле потоков. Воркер забирает
+задачу условным UPDATE (несколько воркеров не возьмут одну и ту же) на
+``LEASE_SECONDS``; если воркер упал, по истечении аренды задачу заберёт
+другой. Упавшая задача повторяется с экспоненциальной задержкой, после
+``max_attempts`` попыток остаётся в таблице со статусом ``failed`` и
+текстом ошибки. Выполненные задачи удаляются. Задача может выполниться
+повторно (упавший воркер, ошибка после части работы), поэтому она
+должна быть идемпотентной.
+
+``TASKS_EAGER = True`` выполняет задачу сразу при постановке, а
+``run_pending()`` — готовые задачи в текущем потоке; оба нужны тестам.
+"""
+import functools
+import json
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+from .routers import use_primary
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# Задержка перед повтором, секунд; удваивается с каждой попыткой.
+RETRY_DELAY = 10
+MAX_RETRY_DELAY = 3600
+LEASE_SECONDS = 300
+
+
+class TaskFunction:
+    """Функция задачи: вызывается как обычно или ставится в очередь."""
+
+    def __init__(self, func, max_attempts=MAX_ATTEMPTS,
+                 retry_delay=RETRY_DELAY):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, dedupe_key=None, delay=0, **kwargs):
+        """Ставит вызов в очередь; ``None``, если такой уже ждёт."""
+        if getattr(settings, 'TASKS_EAGER', False):
+            self.func(*args, **kwargs)
+            return None
+        task = Task(
+            name=self.name,
+            arguments=json.dumps({'args': args, 'kwargs': kwargs}),
+            dedupe_key=dedupe_key,
+            max_attempts=self.max_attempts,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+        try:
+            # Точка сохранения: конфликт ключа не ломает транзакцию
+            # запроса, поставившего задачу.
+            with transaction.atomic():
+                task.save()
+        except IntegrityError:
+            if dedupe_key is None:
+                raise
+            return None
+        return task
+
+
+def task(max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+    """Объявляет функцию задачей очереди."""
+    def decorator(func):
+        return TaskFunction(func, max_attempts, retry_delay)
+    return decorator
+
+
+def _due(now):
+    return (
+        Q(status=Task.PENDING, run_after__lte=now)
+        | Q(status=Task.RUNNING, locked_until__lt=now)
+    )
+
+
+def claim(limit, lease=LEASE_SECONDS):
+    """Забирает до ``limit`` готовых задач в работу этому воркеру."""
+    now = timezone.now()
+    candidates = Task.objects.filter(_due(now)).order_by(
+        'run_after', 'id'
+    ).values_list('id', flat=True)[:limit]
+    claimed = [
+        task_id for task_id in list(candidates)
+        if Task.objects.filter(_due(now), id=task_id).update(
+            status=Task.RUNNING,
+            locked_until=now + timedelta(seconds=lease),
+            attempts=F('attempts') + 1,
+        )
+    ]
+    return list(Task.objects.filter(id__in=claimed))
+
+
+def retry_delay(task, base=RETRY_DELAY):
+    return min(base * 2 ** (task.attempts - 1), MAX_RETRY_DELAY)
+
+
+def _fail(task, function, error):
+    tasks = Task.objects.filter(id=task.id)
+    if task.attempts >= task.max_attempts:
+        logger.error(
+            'Задача %s (%s) не выполнена за %s попыток: %s',
+            task.id, task.name, task.attempts, error,
+        )
+        tasks.update(
+            status=Task.FAILED, locked_until=None, last_error=error
+        )
+        return
+    delay = retry_delay(task, getattr(function, 'retry_delay', RETRY_DELAY))
+    logger.warning(
+        'Задача %s (%s) упала, повтор через %s с', task.id, task.name, delay
+    )
+    try:
+        with transaction.atomic():
+            tasks.update(
+                status=Task.PENDING,
+                locked_until=None,
+                last_error=error,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # С тем же ключом уже стоит более новая задача: она всё сделает.
+        tasks.delete()
+
+
+def execute(task):
+    """Выполняет забранную задачу; ``True``, если она прошла."""
+    function = None
+    try:
+        # Задача читает то, что только что записал запрос: реплики могут
+        # ещё этого не знать.
+        with use_primary():
+            function = import_string(task.name)
+            arguments = json.loads(task.arguments)
+            function(*arguments['args'], **arguments['kwargs'])
+            Task.objects.filter(id=task.id).delete()
+        return True
+    except Exception:
+        _fail(task, function, traceback.format_exc())
+        return False
+    finally:
+        close_old_connections()
+
+
+def run_pending():
+    """Выполняет готовые задачи в текущем потоке (тесты, отладка).
+
+    Возвращает пару (выполнено, не выполнено).
+    """
+    done = failed = 0
+    while True:
+        with use_primary():
+            tasks = claim(1)
+        if not tasks:
+            return done, failed
+        if execute(tasks[0]):
+            done += 1
+        else:
+            failed += 1
+
+
+def work(concurrency=4, once=False, poll_interval=1.0):
+    """Цикл воркера; с ``once`` выходит, когда готовых задач не осталось.
+
+    Возвращает пару (выполнено, не выполнено).
+    """
+    done = failed = 0
+    with ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix='tasks'
+    ) as pool:
+        while True:
+            with use_primary():
+                tasks = claim(concurrency * 2)
+            if not tasks:
+                if once:
+                    return done, failed
+                close_old_connections()
+                time.sleep(poll_interval)
+                continue
+            for succeeded in pool.map(execute, tasks):
+                if succeeded:
+                    done += 1
+                else:
+                    failed += 1
@@ -0,0 +1,80 @@
+"""Бэкенд шаблонов Django, замеряющий время рендера для ``core.metrics``.
+
+Замеряются шаблоны, которые рендерят представления (``render``,
+``render_to_string``); ``{% include %}`` и inclusion-теги выполняются
+внутри них и отдельно не учитываются.
+
+``warm_templates()`` заранее компилирует все шаблоны в кэш
+``cached.Loader`` (профиль продакшена вызывает её при старте воркера).
+"""
+import logging
+import os
+
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with metrics.template_timer():
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def _loader_dirs(loaders):
+    for loader in loaders:
+        # cached.Loader оборачивает настоящие загрузчики.
+        if hasattr(loader, 'loaders'):
+            yield from _loader_dirs(loader.loaders)
+        elif hasattr(loader, 'get_dirs'):
+            yield from loader.get_dirs()
+
+
+def template_names(backend):
+    """Имена всех шаблонов в каталогах загрузчиков движка."""
+    names = set()
+    for directory in _loader_dirs(backend.engine.template_loaders):
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                names.add(
+                    os.path.relpath(path, directory).replace(os.sep, '/')
+                )
+    return sorted(names)
+
+
+def warm_templates():
+    """Компилирует шаблоны всех движков Django; возвращает их число.
+
+    Шаблоны с ошибками пишутся в лог и не мешают старту.
+    """
+    compiled = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in template_names(backend):
+            try:
+                backend.engine.get_template(name)
+            except TemplateSyntaxError:
+                logger.exception('Шаблон %s не компилируется', name)
+            else:
+                compiled += 1
+    return compiled
@@ -0,0 +1,10 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class StrictQueriesRunner(DiscoverRunner):
+    """Тесты запускаются со строгой проверкой N+1 (``core.querylog``)."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.NPLUSONE_STRICT = True
@@ -1,9 +1,58 @@
+import contextvars
+import multiprocessing
+import os
+import re
+import sqlite3
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.template import engines
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, override_settings,
+)
+from django.urls import reverse
 from http import HTTPStatus
 
+from . import bench
+from .cache import (
+    _page_key, bump_generation, cache_stats, generation_cache_page,
+    reset_cache_stats,
+)
+from .cache_backends import SQLiteCache
+from .management.commands import bench_sqlite
+from .db_backends.sqlite3.base import DatabaseWrapper
+from .metrics import Histogram, registry
+from .models import Task
+from .querylog import NPlusOneError, inspect_queries, query_shape
+from .ratelimit import CacheStore, get_store, parse_rate, take
+from .routers import PIN_COOKIE, ReplicaPinMiddleware, ReplicaRouter
+from .sqlite import pragma_statements
+from .template_backends import template_names, warm_templates
+from .tasks import run_pending, task
+
 
 User = get_user_model()
+CALLS = []
+
+
+@task()
+def remember(value):
+    CALLS.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise ValueError('сломалось')
 
 
 class CoreURLTests(TestCase):
@@ -29,3 +78,497 @@ class CoreURLTests(TestCase):
                 response = self.authorized_client.get(url)
                 self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
                 self.assertTemplateUsed(response, template)
+
+
+class GenerationCachePageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        self.calls = 0
+
+        @generation_cache_page(lambda request: ['feed:test'])
+        def view(request):
+            self.calls += 1
+            return HttpResponse(f'render #{self.calls}')
+
+        self.view = view
+        self.request = RequestFactory().get('/feed/')
+        self.request.user = AnonymousUser()
+
+    def lock_rebuild(self):
+        key = _page_key(self.view.__wrapped__, self.request)
+        cache.add(f'{key}:lock', 1)
+
+    def test_page_cached_until_generation_bump(self):
+        """Страница берётся из кэша до смены поколения ленты."""
+        self.assertEqual(self.view(self.request).content, b'render #1')
+        self.assertEqual(self.view(self.request).content, b'render #1')
+        bump_generation('feed:test')
+        self.assertEqual(self.view(self.request).content, b'render #2')
+
+    def test_concurrent_miss_gets_stale_copy(self):
+        """Пока страницу перестраивают, отдаётся устаревшая копия."""
+        self.view(self.request)
+        bump_generation('feed:test')
+        self.lock_rebuild()
+        self.assertEqual(self.view(self.request).content, b'render #1')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(
+            cache_stats()[f'{__name__}.view'],
+            {'hit': 0, 'miss': 1, 'stale': 1},
+        )
+
+    @mock.patch('core.cache.REBUILD_WAIT', 0.1)
+    def test_concurrent_miss_without_copy_renders_after_wait(self):
+        """Без копии запрос ждёт перестроения, затем рендерит сам."""
+        self.lock_rebuild()
+        self.assertEqual(self.view(self.request).content, b'render #1')
+
+
+def _incr_many(path):
+    cache = SQLiteCache(path, {})
+    for _ in range(50):
+        cache.add('counter', 0)
+        cache.incr('counter')
+
+
+class BenchTests(SimpleTestCase):
+    def test_compare_reports_regressions(self):
+        """Рост запросов — всегда регрессия, времени — сверх допуска."""
+        baseline = {
+            'page': {'p50_ms': 10.0, 'queries': 3},
+            'gone': {'p50_ms': 1.0, 'queries': 1},
+        }
+        self.assertEqual(bench.compare(
+            {'page': {'p50_ms': 12.0, 'queries': 3}}, baseline, .25
+        ), [])
+        self.assertEqual(bench.compare(
+            {'page': {'p50_ms': 13.0, 'queries': 4}}, baseline, .25
+        ), ['page: запросов 3 → 4', 'page: p50_ms 10.0 → 13.0'])
+        # Быстрые замеры сравниваются с поправкой на шум таймера.
+        self.assertEqual(bench.compare(
+            {'gone': {'p50_ms': 1.9, 'queries': 1}}, baseline, .25
+        ), [])
+
+    def test_percentile(self):
+        self.assertEqual(bench.percentile([3, 1, 2, 4], .5), 3)
+        self.assertEqual(bench.percentile([3, 1, 2, 4], .99), 4)
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(
+            self.path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        """get/set/add/incr/delete работают как у встроенных бэкендов."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 5))
+        self.assertEqual(self.cache.incr('new', 2), 7)
+        self.assertEqual(self.cache.decr('new'), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get_many(['new', 'key']), {'new': 6})
+
+    def test_expired_entry_can_be_added_again(self):
+        """Истёкшая запись не мешает add."""
+        self.cache.set('key', 'old', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_cull_evicts_least_recently_read(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        with mock.patch('core.cache_backends.CULL_CHECK_EVERY', 1):
+            for i in range(10):
+                self.cache.set(f'key{i}', i)
+            with mock.patch('core.cache_backends.ACCESS_RESOLUTION', -1):
+                self.cache.get('key0')
+            self.cache.set('key10', 10)
+        self.assertEqual(self.cache.get('key0'), 0)
+        self.assertIsNone(self.cache.get('key1'))
+
+    def test_incr_is_atomic_across_processes(self):
+        """incr из нескольких процессов не теряет приращений."""
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=_incr_many, args=(self.path,))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = Client()
+
+    def test_request_metrics_and_server_timing(self):
+        """Запрос попадает в гистограммы и в заголовок Server-Timing."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('cache;desc="miss"', response['Server-Timing'])
+        self.client.get(reverse('posts:index'))
+
+        data = registry.snapshot()['posts:index']
+        histograms = data['histograms']
+        self.assertEqual(histograms['request_duration_ms']['count'], 2)
+        self.assertGreater(histograms['db_queries']['sum'], 0)
+        self.assertGreater(histograms['template_duration_ms']['sum'], 0)
+        self.assertEqual(data['cache'], {'miss': 1, 'hit': 1})
+
+    def test_histogram_buckets(self):
+        """Корзины накопительные, последняя — +Inf."""
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+        self.assertEqual(
+            list(histogram.cumulative()), [(1, 2), (10, 3), ('+Inf', 4)]
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_access(self):
+        """Метрики видны сотрудникам и по токену, остальным — 404."""
+        self.client.get(reverse('posts:index'))
+        url = reverse('metrics')
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+        )
+        self.assertEqual(
+            self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong')
+            .status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertContains(
+            response,
+            'yatube_request_duration_ms_count{view="posts:index"} 1',
+        )
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        response = self.client.get(url, {'format': 'json'})
+        self.assertIn('posts:index', response.json())
+
+
+class QueryLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(5):
+            User.objects.create_user(username=f'user{number}')
+
+    def test_repeated_queries_raise_in_strict_mode(self):
+        """Пятый запрос одной формы в строгом режиме — N+1 с местом вызова.
+        """
+        users = list(User.objects.all())
+        with self.assertRaisesMessage(NPlusOneError, 'core/tests.py'):
+            with inspect_queries(view='test', strict=True):
+                for user in users:
+                    User.objects.get(id=user.id)
+
+    def test_repeated_queries_logged(self):
+        """Без строгого режима N+1 пишется в лог, а не прерывает запрос."""
+        with self.assertLogs('core.querylog', 'WARNING') as logs:
+            with inspect_queries(view='test') as inspector:
+                for user in User.objects.all():
+                    User.objects.filter(id=user.id).exists()
+        self.assertEqual(len(inspector.repeated), 1)
+        self.assertIn('N+1: 5 одинаковых запросов в test', logs.output[0])
+
+    def test_slow_query_logged(self):
+        """Запрос дольше порога пишется в лог с представлением."""
+        with self.assertLogs('core.querylog', 'WARNING') as logs:
+            with inspect_queries(view='posts:index', slow_ms=0,
+                                 track_repeats=False):
+                User.objects.count()
+        self.assertIn('Медленный запрос', logs.output[0])
+        self.assertIn('posts:index', logs.output[0])
+
+    def test_query_shape(self):
+        """Списки IN разной длины дают одну форму запроса."""
+        self.assertEqual(
+            query_shape('SELECT 1 WHERE id IN (%s, %s, %s)'),
+            query_shape('SELECT 1 WHERE id IN (%s)'),
+        )
+
+
+class SQLiteProfileTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'db.sqlite3')
+        self.connection = DatabaseWrapper({
+            'ENGINE': 'core.db_backends.sqlite3',
+            'NAME': self.path,
+            'ATOMIC_REQUESTS': False,
+            'AUTOCOMMIT': True,
+            'CONN_MAX_AGE': 600,
+            'TIME_ZONE': None,
+            'OPTIONS': {'timeout': 0, 'transaction_mode': 'immediate'},
+            'PRAGMAS': {'journal_mode': 'wal', 'synchronous': 'normal'},
+        }, alias='profile')
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        """Прагмы из DATABASES выполняются при подключении."""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+    def test_transaction_takes_write_lock_at_begin(self):
+        """Транзакция начинается с BEGIN IMMEDIATE: второй писатель ждёт."""
+        self.connection.ensure_connection()
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        # Так atomic начинает транзакцию в режиме автокоммита.
+        self.connection._start_transaction_under_autocommit()
+        with self.assertRaisesMessage(
+            sqlite3.OperationalError, 'database is locked'
+        ):
+            other.execute('BEGIN IMMEDIATE')
+        self.connection.rollback()
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+        other.close()
+
+    def test_invalid_pragma_rejected(self):
+        """Значение прагмы не может внедрить лишний SQL."""
+        with self.assertRaises(ImproperlyConfigured):
+            list(pragma_statements({'cache_size': '1; DROP TABLE x'}))
+
+    def test_bench_reads_production_profile_aside(self):
+        """Бенчмарк читает профиль продакшена, не меняя своих настроек."""
+        def current():
+            return repr((settings.DATABASES, settings.TEMPLATES))
+
+        before = current()
+        production = bench_sqlite._profiles('yatube.settings_prod')[
+            'production'
+        ]
+        self.assertEqual(production['begin'], 'BEGIN IMMEDIATE')
+        self.assertEqual(production['pragmas']['journal_mode'], 'wal')
+        self.assertEqual(current(), before)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def read_in_new_context(self):
+        return contextvars.Context().run(self.router.db_for_read, User)
+
+    def handle(self, request, write=False):
+        """Запрос через middleware; возвращает ответ и базу чтения."""
+        reads = []
+
+        def view(request):
+            if write:
+                self.router.db_for_write(User)
+            reads.append(self.router.db_for_read(User))
+            return HttpResponse()
+
+        response = contextvars.Context().run(
+            ReplicaPinMiddleware(view), request
+        )
+        return response, reads[0]
+
+    def test_reads_go_to_replica(self):
+        """Без записи чтения идут на реплику, записи — в default."""
+        self.assertEqual(self.read_in_new_context(), 'replica')
+        self.assertEqual(self.router.db_for_write(User), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.read_in_new_context(), 'default')
+
+    def test_reads_in_transaction_go_to_primary(self):
+        """Внутри транзакции основной базы чтения не уходят на реплику."""
+        with mock.patch.object(connection, 'in_atomic_block', True):
+            self.assertEqual(self.read_in_new_context(), 'default')
+
+    def test_write_pins_client_to_primary(self):
+        """После записи клиент читает из основной базы, пока жив cookie."""
+        response, read = self.handle(self.factory.post('/'), write=True)
+        self.assertEqual(read, 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        response, read = self.handle(request)
+        self.assertEqual(read, 'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = str(time.time() - 1)
+        self.assertEqual(self.handle(request)[1], 'replica')
+        self.assertEqual(self.handle(self.factory.get('/'))[1], 'replica')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_and_run(self):
+        """Задача выполняется воркером и удаляется из очереди."""
+        remember.enqueue('первый')
+        self.assertEqual(CALLS, [])
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertEqual(CALLS, ['первый'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_dedupe_key(self):
+        """Пока задача ждёт, вторая с тем же ключом не ставится."""
+        self.assertIsNotNone(remember.enqueue(1, dedupe_key='key'))
+        self.assertIsNone(remember.enqueue(2, dedupe_key='key'))
+        run_pending()
+        self.assertEqual(CALLS, [1])
+        self.assertIsNotNone(remember.enqueue(3, dedupe_key='key'))
+
+    def test_delay(self):
+        """Отложенная задача не выполняется раньше срока."""
+        remember.enqueue('позже', delay=60)
+        self.assertEqual(run_pending(), (0, 0))
+        self.assertEqual(CALLS, [])
+
+    def test_retry_then_fail(self):
+        """Упавшая задача повторяется, затем остаётся с ошибкой."""
+        explode.enqueue()
+        self.assertEqual(run_pending(), (0, 1))
+        failed = Task.objects.get()
+        self.assertEqual(failed.status, Task.PENDING)
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn('сломалось', failed.last_error)
+        Task.objects.update(run_after=failed.created)
+        self.assertEqual(run_pending(), (0, 1))
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager(self):
+        """С TASKS_EAGER задача выполняется сразу."""
+        remember.enqueue('сразу')
+        self.assertEqual(CALLS, ['сразу'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_password_reset_mail_queued(self):
+        """Письмо сброса пароля отправляет очередь, а не запрос."""
+        User.objects.create_user(
+            username='reader', email='reader@test.ru', password='secret-1'
+        )
+        response = Client().post(
+            reverse('users:password_reset'), {'email': 'reader@test.ru'}
+        )
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        # Ссылка с токеном в таблице очереди не хранится.
+        self.assertNotIn('/auth/reset/', Task.objects.get().arguments)
+        run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@test.ru'])
+        # Токен, построенный задачей, действителен.
+        path = re.search(r'/auth/reset/\S+', mail.outbox[0].body).group()
+        response = Client().get(path)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertTrue(response.url.endswith('/set-password/'))
+
+
+@override_settings(RATE_LIMITS={
+    'post_create': {'user': '2/m', 'ip': '3/m'},
+})
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.other = User.objects.create_user(username='other_writer')
+
+    def setUp(self):
+        get_store().clear()
+        # Опустевшие вёдра не должны достаться другим тестам.
+        self.addCleanup(get_store().clear)
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('posts:post_create')
+
+    def post(self, client=None):
+        return (client or self.client).post(self.url, {'text': 'Пост'})
+
+    def test_token_bucket(self):
+        """Ведро отдаёт запас жетонов и пополняется со временем."""
+        capacity, refill = parse_rate('2/s')
+        bucket, wait = take(None, 0, capacity, refill)
+        bucket, wait = take(bucket, 0, capacity, refill)
+        self.assertEqual(wait, 0)
+        bucket, wait = take(bucket, 0, capacity, refill)
+        self.assertAlmostEqual(wait, 0.5)
+        _, wait = take(bucket, 0.5, capacity, refill)
+        self.assertEqual(wait, 0)
+        with self.assertRaises(ValueError):
+            parse_rate('10 в минуту')
+
+    def test_user_limit(self):
+        """Сверх лимита пользователя — 429 без запросов к базе."""
+        self.assertEqual(self.post().status_code, HTTPStatus.FOUND)
+        self.assertEqual(self.post().status_code, HTTPStatus.FOUND)
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(2):
+            # Сессия и пользователь; ни одного запроса представления.
+            response = self.post()
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+        # Просмотр формы не тратит жетоны.
+        self.assertEqual(self.client.get(self.url).status_code, HTTPStatus.OK)
+
+    def test_ip_limit(self):
+        """Лимит адреса общий для пользователей и срабатывает до сессии."""
+        other = Client()
+        other.force_login(self.other)
+        self.post()
+        self.post()
+        self.post(other)
+        with self.assertNumQueries(0):
+            response = self.post(other)
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        other = Client(REMOTE_ADDR='10.0.0.2')
+        other.force_login(self.other)
+        self.assertEqual(self.post(other).status_code, HTTPStatus.FOUND)
+
+    @override_settings(RATE_LIMIT_STORE='cache')
+    def test_cache_store(self):
+        """Вёдра в кэше Django общие для всех экземпляров хранилища."""
+        cache.clear()
+        capacity, refill = parse_rate('1/m')
+        self.assertEqual(CacheStore().consume('key', capacity, refill), 0)
+        self.assertGreater(CacheStore().consume('key', capacity, refill), 0)
+        self.assertEqual(self.post().status_code, HTTPStatus.FOUND)
+
+
+class TemplateWarmupTests(SimpleTestCase):
+    def test_all_templates_compile(self):
+        """Прогрев компилирует все шаблоны проекта и приложений."""
+        names = template_names(engines['django'])
+        self.assertIn('posts/index.html', names)
+        self.assertIn('admin/base.html', names)
+        with mock.patch('core.template_backends.logger') as logger:
+            self.assertEqual(warm_templates(), len(names))
+        logger.exception.assert_not_called()
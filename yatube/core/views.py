@@ -1,5 +1,11 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render
 
+from . import metrics as request_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +21,28 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def _metrics_allowed(request):
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+
+def metrics(request):
+    """Метрики процесса: Prometheus по умолчанию, JSON с ``?format=json``.
+
+    Доступно сотрудникам и по ``Authorization: Bearer <METRICS_TOKEN>``,
+    остальным — ``404``, чтобы не выдавать адрес.
+    """
+    if not _metrics_allowed(request):
+        raise Http404
+    snapshot = request_metrics.registry.snapshot()
+    if request.GET.get('format') == 'json':
+        return JsonResponse(snapshot)
+    return HttpResponse(
+        request_metrics.prometheus(snapshot),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,141 @@
+"""JSON-API только для чтения: те же ленты, что в posts.views.
+
+Ответы листаются курсором и несут сильный ``ETag`` из id, версий и
+дат постов страницы, а также ``Last-Modified`` по самой поздней правке.
+Если страница не изменилась, клиент получает ``304 Not Modified``,
+а сериализация не выполняется.
+"""
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from core.cache import make_etag
+
+from . import timeline
+from .models import Group, Post
+from .paginators import CursorPaginator
+from .views import DISPLAYED_COUNT, FEED_ORDERING, comments_page
+
+
+User = get_user_model()
+
+JSON_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def api_login_required(view):
+    """Вместо редиректа на страницу входа — ``401`` в JSON."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'detail': 'Требуется вход'}, status=401,
+                json_dumps_params=JSON_PARAMS,
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _cursor_url(request, cursor):
+    if cursor is None:
+        return None
+    return f'{request.path}?cursor={cursor}'
+
+
+def serialize_post(post):
+    return {
+        'id': post.id,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'version': post.version,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'pub_date': comment.pub_date.isoformat(),
+    }
+
+
+def conditional_json(request, etag, last_modified, build):
+    """``304`` для совпавшего ETag, иначе JSON из ``build()``."""
+    timestamp = last_modified.timestamp() if last_modified else None
+    # Удаление поста не двигает даты, поэтому If-Modified-Since без
+    # ETag не проверяется: Last-Modified только для сведения клиента.
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(build(), json_dumps_params=JSON_PARAMS)
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Клиент хранит ответ, но перепроверяет его при каждом опросе.
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def feed_response(request, queryset, ordering=FEED_ORDERING):
+    paginator = CursorPaginator(queryset, DISPLAYED_COUNT, ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    etag = make_etag(
+        [
+            (post.id, post.version, post.pub_date, post.author.username)
+            for post in page
+        ],
+        page.next_cursor,
+    )
+    last_modified = max((post.modified for post in page), default=None)
+    return conditional_json(request, etag, last_modified, lambda: {
+        'results': [serialize_post(post) for post in page],
+        'next': _cursor_url(request, page.next_cursor),
+        'previous': _cursor_url(request, page.previous_cursor),
+    })
+
+
+def index(request):
+    return feed_response(request, Post.objects.feed())
+
+
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, Post.objects.for_group(group))
+
+
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, Post.objects.for_author(author))
+
+
+@api_login_required
+def follow_index(request):
+    return feed_response(
+        request,
+        timeline.follow_feed(request.user).feed(),
+        timeline.ORDERING,
+    )
+
+
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.feed(), id=post_id)
+    comments = comments_page(request, post)
+    etag = make_etag(
+        post.id, post.version, post.author.username,
+        [comment.id for comment in comments], comments.next_cursor,
+    )
+    last_modified = max(
+        [post.modified] + [comment.pub_date for comment in comments]
+    )
+    return conditional_json(request, etag, last_modified, lambda: {
+        **serialize_post(post),
+        'comments': [serialize_comment(comment) for comment in comments],
+        'comments_next': _cursor_url(request, comments.next_cursor),
+    })
@@ -0,0 +1,351 @@
+"""Потоковый импорт и экспорт постов, комментариев и подписок.
+
+Записи читаются и пишутся порциями по ``batch_size`` строк в NDJSON
+или CSV, поэтому память не растёт с размером файла. Импорт идёт через
+``bulk_create``: сигналы не срабатывают, и счётчики, ленты подписок и
+поисковый индекс пересчитываются один раз в конце (``finish_import``).
+Счётчики, ленты подписок, поисковый индекс и кэш страниц обновляются
+только для затронутых импортом пользователей, групп и авторов, а не
+перестраиваются целиком.
+
+Связи задаются естественными ключами: автор — ``username``, группа —
+``slug``; посты и комментарии сохраняют переданные ``id``, чтобы
+комментарии могли сослаться на импортированные посты.
+"""
+import csv
+import json
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching, counters, search, timeline
+from .models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+# Столько id в одном IN: у SQLite есть предел параметров запроса.
+IDS_PER_QUERY = 500
+FORMATS = ('ndjson', 'csv')
+KINDS = ('posts', 'comments', 'follows')
+# Поля записей в порядке колонок CSV.
+FIELDS = {
+    'posts': (
+        'id', 'text', 'pub_date', 'modified', 'author', 'group', 'image',
+    ),
+    'comments': ('id', 'post', 'author', 'text', 'pub_date'),
+    'follows': ('user', 'author'),
+}
+EXPORT_COLUMNS = {
+    'posts': (
+        'id', 'text', 'pub_date', 'modified', 'author__username',
+        'group__slug', 'image',
+    ),
+    'comments': ('id', 'post_id', 'author__username', 'text', 'pub_date'),
+    'follows': ('user__username', 'author__username'),
+}
+MODELS = {'posts': Post, 'comments': Comment, 'follows': Follow}
+
+
+class InvalidRecord(ValueError):
+    """Запись нельзя импортировать."""
+
+
+def detect_format(path):
+    return 'csv' if str(path).endswith('.csv') else 'ndjson'
+
+
+def read_records(stream, fmt):
+    """Записи файла по одной; пустые строки пропускаются."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_records(stream, fmt, kind, rows):
+    """Пишет строки ``values_list`` и возвращает их число."""
+    fields = FIELDS[kind]
+    written = 0
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow([_export_value(value) for value in row])
+            written += 1
+        return written
+    for row in rows:
+        record = {
+            field: _export_value(value) for field, value in zip(fields, row)
+        }
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        written += 1
+    return written
+
+
+def _export_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def export_rows(kind, batch_size=BATCH_SIZE):
+    """Строки для экспорта; ``iterator`` читает их порциями с сервера."""
+    return MODELS[kind].objects.order_by().values_list(
+        *EXPORT_COLUMNS[kind]
+    ).iterator(chunk_size=batch_size)
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Progress:
+    """Печатает число строк и скорость не чаще раза в ``every`` секунд."""
+
+    def __init__(self, label, write, every=2.0):
+        self.label = label
+        self.write = write
+        self.every = every
+        self.count = 0
+        self.started = self.reported = time.monotonic()
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.count / elapsed if elapsed else 0.0
+
+    def add(self, count):
+        self.count += count
+        now = time.monotonic()
+        if now - self.reported >= self.every:
+            self.reported = now
+            self.write(self.summary())
+
+    def summary(self):
+        return f'{self.label}: {self.count:,} строк, {self.rate:,.0f} строк/с'
+
+
+@contextmanager
+def keep_dates(model):
+    """Отключает auto_now/auto_now_add, чтобы сохранить даты из файла."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _date(value, default):
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise InvalidRecord(f'Неверная дата: {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _optional_id(value):
+    return int(value) if value not in (None, '') else None
+
+
+def _user_ids(usernames):
+    """id пользователей порции; недостающие создаются без пароля."""
+    usernames = set(usernames)
+    found = dict(
+        User.objects.filter(username__in=usernames).values_list(
+            'username', 'id'
+        )
+    )
+    missing = usernames - found.keys()
+    if missing:
+        User.objects.bulk_create(
+            [
+                User(username=username, password=make_password(None))
+                for username in missing
+            ],
+            ignore_conflicts=True,
+        )
+        found.update(
+            User.objects.filter(username__in=missing).values_list(
+                'username', 'id'
+            )
+        )
+    return found
+
+
+def reset_sequences(*models):
+    # После вставки с явными id последовательность PostgreSQL
+    # отстаёт; в SQLite запросов не будет.
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+class Importer:
+    def __init__(self, kind, batch_size=BATCH_SIZE):
+        self.kind = kind
+        self.model = MODELS[kind]
+        self.batch_size = batch_size
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        # Чьи ленты подписчиков и чьи страницы изменил импорт.
+        self.author_ids = set()
+        self.usernames = set()
+        # Чьи счётчики изменил импорт.
+        self.user_ids = set()
+        self.group_ids = set()
+
+    def _group_id(self, slug):
+        if not slug:
+            return None
+        if slug not in self.groups:
+            raise InvalidRecord(f'Нет группы {slug!r}')
+        return self.groups[slug]
+
+    def build(self, records):
+        users = _user_ids(
+            username
+            for record in records
+            for username in (record.get('author'), record.get('user'))
+            if username
+        )
+        now = timezone.now()
+        if self.kind == 'posts':
+            for record in records:
+                pub_date = _date(record.get('pub_date'), now)
+                group_id = self._group_id(record.get('group'))
+                self.author_ids.add(users[record['author']])
+                self.user_ids.add(users[record['author']])
+                self.usernames.add(record['author'])
+                if group_id is not None:
+                    self.group_ids.add(group_id)
+                yield Post(
+                    id=_optional_id(record.get('id')),
+                    text=record['text'],
+                    pub_date=pub_date,
+                    modified=_date(record.get('modified'), pub_date),
+                    author_id=users[record['author']],
+                    group_id=group_id,
+                    image=record.get('image') or '',
+                )
+        elif self.kind == 'comments':
+            post_ids = set()
+            for record in records:
+                post_ids.add(int(record['post']))
+                self.user_ids.add(users[record['author']])
+                self.usernames.add(record['author'])
+                yield Comment(
+                    id=_optional_id(record.get('id')),
+                    post_id=int(record['post']),
+                    author_id=users[record['author']],
+                    text=record['text'],
+                    pub_date=_date(record.get('pub_date'), now),
+                )
+            self.group_ids.update(
+                Post.objects.filter(id__in=post_ids)
+                .exclude(group=None).values_list('group_id', flat=True)
+            )
+        else:
+            for record in records:
+                if record['user'] != record['author']:
+                    self.author_ids.add(users[record['author']])
+                    self.user_ids.update(
+                        (users[record['user']], users[record['author']])
+                    )
+                    self.usernames.update((record['user'], record['author']))
+                    yield Follow(
+                        user_id=users[record['user']],
+                        author_id=users[record['author']],
+                    )
+
+    def run(self, records, progress):
+        # Подписки уникальны: повтор из файла просто пропускается.
+        ignore_conflicts = self.kind == 'follows'
+        with keep_dates(self.model):
+            for chunk in chunks(records, self.batch_size):
+                with transaction.atomic():
+                    # Размер INSERT выбирает Django: у SQLite есть предел
+                    # числа строк в одном запросе.
+                    self.model.objects.bulk_create(
+                        list(self.build(chunk)),
+                        ignore_conflicts=ignore_conflicts,
+                    )
+                progress.add(len(chunk))
+        reset_sequences(self.model)
+
+
+def _by_ids(ids):
+    return chunks(sorted(ids), IDS_PER_QUERY)
+
+
+def finish_import(kinds, write, importer=None):
+    """Пересчитывает то, что при импорте не обновлялось сигналами.
+
+    С ``importer`` пересчитываются только затронутые им пользователи,
+    группы и авторы: их счётчики, ленты подписчиков и поисковый индекс
+    их постов. Без него — всё целиком.
+    """
+    started = time.monotonic()
+    with transaction.atomic():
+        if importer is None:
+            fixed = counters.rebuild()
+        else:
+            fixed = sum(
+                counters.rebuild_profiles(ids)
+                for ids in _by_ids(importer.user_ids)
+            ) + sum(
+                counters.rebuild_groups(ids)
+                for ids in _by_ids(importer.group_ids)
+            )
+        write(f'Счётчики пересчитаны, исправлено строк: {fixed}')
+        if {'posts', 'follows'} & set(kinds):
+            if importer is None:
+                entries = timeline.rebuild()
+                write(f'Ленты подписок собраны, записей: {entries}')
+            else:
+                timeline.rebuild_authors(importer.author_ids)
+                write(
+                    'Ленты подписок дополнены, авторов: '
+                    f'{len(importer.author_ids)}'
+                )
+        if 'posts' in kinds:
+            if importer is None:
+                indexed = search.rebuild()
+            else:
+                indexed = sum(
+                    search.reindex(Post.objects.filter(author_id__in=ids))
+                    for ids in _by_ids(importer.author_ids)
+                )
+            write(f'Поисковый индекс построен, постов: {indexed}')
+        # Кэш общий с сессиями и лимитами: сбрасываются только поколения
+        # лент, которые мог изменить импорт.
+        caching.invalidate_import(
+            None if importer is None else importer.usernames
+        )
+    write(f'Пересчёт занял {time.monotonic() - started:.1f} с')
@@ -0,0 +1,96 @@
+"""Имена лент для кэша страниц и их сброс при изменении данных."""
+from django.contrib.auth import get_user_model
+
+from core.cache import invalidate
+
+from .models import Group, Post
+
+
+User = get_user_model()
+
+
+INDEX_FEED = 'feed:index'
+
+
+def group_feed(slug):
+    return f'feed:group:{slug}'
+
+
+def profile_feed(username):
+    return f'feed:profile:{username}'
+
+
+def _group_slugs(*group_ids):
+    ids = [group_id for group_id in group_ids if group_id is not None]
+    if not ids:
+        return []
+    return list(
+        Group.objects.filter(id__in=ids).values_list('slug', flat=True)
+    )
+
+
+def invalidate_post(post, previous_group_id=None):
+    """Пост виден в общей ленте, ленте группы и профиле автора."""
+    invalidate(
+        INDEX_FEED,
+        profile_feed(post.author.username),
+        *map(group_feed, _group_slugs(post.group_id, previous_group_id)),
+    )
+
+
+def invalidate_group(group, *slugs):
+    """Карточки группы показаны в общей ленте и профилях её авторов."""
+    authors = Post.objects.filter(group=group).values_list(
+        'author__username', flat=True
+    ).distinct()
+    invalidate(
+        INDEX_FEED,
+        group_feed(group.slug),
+        *map(group_feed, slugs),
+        *map(profile_feed, authors),
+    )
+
+
+def invalidate_author(author, *usernames):
+    """Имя автора показано в его профиле и карточках во всех лентах."""
+    slugs = Group.objects.filter(posts__author=author).values_list(
+        'slug', flat=True
+    ).distinct()
+    invalidate(
+        INDEX_FEED,
+        profile_feed(author.username),
+        *map(profile_feed, usernames),
+        *map(group_feed, slugs),
+    )
+
+
+def invalidate_comment(comment):
+    """Счётчики комментариев видны в группе и профиле комментатора."""
+    invalidate(
+        profile_feed(comment.author.username),
+        *map(group_feed, _group_slugs(comment.post.group_id)),
+    )
+
+
+def invalidate_follow(follow):
+    invalidate(
+        profile_feed(follow.author.username),
+        profile_feed(follow.user.username),
+    )
+
+
+def invalidate_import(usernames=None):
+    """Общая лента, все группы и профили ``usernames`` (``None`` — все).
+
+    Групп немного, а какие из них затронул импорт комментариев, без
+    лишних запросов не узнать, поэтому сбрасываются все.
+    """
+    if usernames is None:
+        usernames = User.objects.values_list(
+            'username', flat=True
+        ).iterator()
+    invalidate(
+        INDEX_FEED,
+        *map(group_feed, Group.objects.values_list('slug', flat=True)),
+        *map(profile_feed, usernames),
+    )
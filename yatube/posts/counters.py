@@ -0,0 +1,125 @@
+"""Денормализованные счётчики авторов и групп.
+
+Счётчики меняются выражениями ``F()`` в той же транзакции, что и
+сама запись, поэтому страницам не нужен ``COUNT(*)``. Если значения
+разошлись с данными, их пересчитывает ``manage.py rebuild_counters``.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, Group, Post, Profile
+
+
+User = get_user_model()
+
+PROFILE_COUNTERS = (
+    'posts_count', 'comments_count', 'followers_count', 'following_count',
+)
+GROUP_COUNTERS = ('posts_count', 'comments_count')
+
+
+def profile_for(user):
+    """Профиль пользователя; создаётся, если его ещё нет."""
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        return Profile.objects.get_or_create(user=user)[0]
+
+
+def _expression(field, delta):
+    if delta < 0:
+        # Разошедшийся счётчик не должен уходить в минус.
+        return Greatest(F(field) + delta, Value(0))
+    return F(field) + delta
+
+
+def _change(queryset, **deltas):
+    return queryset.update(**{
+        field: _expression(field, delta) for field, delta in deltas.items()
+    })
+
+
+def change_profile(user_id, **deltas):
+    if user_id is None:
+        return
+    updated = _change(Profile.objects.filter(user_id=user_id), **deltas)
+    if updated or min(deltas.values()) < 0:
+        return
+    if User.objects.filter(id=user_id).exists():
+        Profile.objects.get_or_create(user_id=user_id, defaults=deltas)
+
+
+def change_group(group_id, **deltas):
+    if group_id is not None:
+        _change(Group.objects.filter(id=group_id), **deltas)
+
+
+def _grouped(queryset, field):
+    return dict(
+        queryset.values_list(field).annotate(total=Count('id')).order_by()
+    )
+
+
+def _only(queryset, field, ids):
+    if ids is None:
+        return queryset
+    return queryset.filter(**{f'{field}__in': ids})
+
+
+def rebuild_profiles(user_ids=None):
+    """Пересчитывает счётчики профилей ``user_ids`` (``None`` — всех)."""
+    users = _only(User.objects.filter(profile__isnull=True), 'id', user_ids)
+    for user in users.iterator():
+        Profile.objects.get_or_create(user=user)
+    actual = {
+        'posts_count': _grouped(
+            _only(Post.objects, 'author_id', user_ids), 'author_id'
+        ),
+        'comments_count': _grouped(
+            _only(Comment.objects, 'author_id', user_ids), 'author_id'
+        ),
+        'followers_count': _grouped(
+            _only(Follow.objects, 'author_id', user_ids), 'author_id'
+        ),
+        'following_count': _grouped(
+            _only(Follow.objects, 'user_id', user_ids), 'user_id'
+        ),
+    }
+    profiles = _only(Profile.objects.all(), 'user_id', user_ids)
+    return _fix(profiles, 'user_id', actual, PROFILE_COUNTERS)
+
+
+def rebuild_groups(group_ids=None):
+    """Пересчитывает счётчики групп ``group_ids`` (``None`` — всех)."""
+    actual = {
+        'posts_count': _grouped(
+            _only(Post.objects, 'group_id', group_ids), 'group_id'
+        ),
+        'comments_count': _grouped(
+            _only(Comment.objects, 'post__group_id', group_ids),
+            'post__group_id',
+        ),
+    }
+    groups = _only(Group.objects.all(), 'id', group_ids)
+    return _fix(groups, 'id', actual, GROUP_COUNTERS)
+
+
+def rebuild():
+    """Пересчитывает все счётчики; возвращает число исправленных строк."""
+    return rebuild_profiles() + rebuild_groups()
+
+
+def _fix(queryset, key, actual, fields):
+    drifted = []
+    for obj in queryset.iterator():
+        changed = False
+        for field in fields:
+            value = actual[field].get(getattr(obj, key), 0)
+            if getattr(obj, field) != value:
+                setattr(obj, field, value)
+                changed = True
+        if changed:
+            drifted.append(obj)
+    queryset.model.objects.bulk_update(drifted, fields, batch_size=500)
+    return len(drifted)
@@ -0,0 +1,222 @@
+"""Синтетический набор данных для нагрузочных замеров.
+
+Распределения перекошены, как на живом сайте: число подписчиков и
+активность авторов подчиняются степенному закону (Ципфа), несколько
+«горячих» групп собирают большую часть постов, а комментарии
+достаются в основном свежим постам. Тексты и имена даёт Faker, группы
+создаёт mixer, остальное вставляется порциями через ``bulk_create`` с
+явными ``id`` и пересчётом производных данных в конце, как при
+``bulk_import``.
+"""
+import itertools
+import random
+from bisect import bisect
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+
+from . import bulk
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+USERS = 100000
+POSTS = 1000000
+GROUPS = 200
+COMMENTS = 300000
+FOLLOWS_PER_USER = 20
+DAYS = 365
+# Доля постов без группы.
+NO_GROUP_SHARE = 0.3
+# Показатели степени закона Ципфа: чем больше, тем сильнее перекос.
+POPULARITY_SKEW = 1.1
+ACTIVITY_SKEW = 0.9
+GROUP_SKEW = 1.2
+COMMENT_SKEW = 0.8
+SENTENCES = 5000
+USERNAME_PREFIX = 'load'
+
+
+class Zipf:
+    """Случайный выбор из ``items`` с весом ``1 / rank ** skew``."""
+
+    def __init__(self, items, skew, rnd):
+        self.items = list(items)
+        self.rnd = rnd
+        self.cum_weights = list(itertools.accumulate(
+            1 / rank ** skew for rank in range(1, len(self.items) + 1)
+        ))
+
+    def choice(self):
+        point = self.rnd.random() * self.cum_weights[-1]
+        return self.items[bisect(self.cum_weights, point)]
+
+    def sample(self, count):
+        """До ``count`` разных элементов (повторы отбрасываются)."""
+        return {self.choice() for _ in range(count)}
+
+
+def _next_id(model):
+    last = model.objects.order_by('-id').values_list('id', flat=True)
+    return (last.first() or 0) + 1
+
+
+class Generator:
+    """Порождает пользователей, группы, посты, комментарии и подписки."""
+
+    def __init__(self, users=USERS, posts=POSTS, groups=GROUPS,
+                 comments=COMMENTS, follows_per_user=FOLLOWS_PER_USER,
+                 days=DAYS, seed=0, batch_size=bulk.BATCH_SIZE,
+                 write=lambda message: None):
+        self.counts = {
+            'users': users, 'posts': posts, 'groups': groups,
+            'comments': comments,
+        }
+        self.follows_per_user = follows_per_user
+        self.days = days
+        self.batch_size = batch_size
+        self.write = write
+        self.rnd = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.now = timezone.now()
+        self.sentences = [
+            self.fake.sentence(nb_words=self.rnd.randint(4, 14))
+            for _ in range(SENTENCES)
+        ]
+
+    def run(self):
+        """Создаёт набор данных; возвращает число строк по видам."""
+        self.user_ids = self._users()
+        self.group_ids = self._groups()
+        self.first_post = _next_id(Post)
+        created = {
+            'users': len(self.user_ids),
+            'groups': len(self.group_ids),
+            'posts': self._insert('posts', Post, self._posts()),
+            'comments': self._insert('comments', Comment, self._comments()),
+            'follows': self._insert('follows', Follow, self._follows()),
+        }
+        bulk.reset_sequences(User, Post, Comment)
+        return created
+
+    def _insert(self, label, model, objects):
+        progress = bulk.Progress(label, self.write)
+        with bulk.keep_dates(model):
+            for chunk in bulk.chunks(objects, self.batch_size):
+                with transaction.atomic():
+                    model.objects.bulk_create(
+                        chunk, ignore_conflicts=model is Follow
+                    )
+                progress.add(len(chunk))
+        self.write(progress.summary())
+        return progress.count
+
+    def _users(self):
+        first = _next_id(User)
+        ids = range(first, first + self.counts['users'])
+        # Пароль непригоден для входа: пользователи только для нагрузки.
+        password = make_password(None)
+        users = (
+            User(
+                id=user_id,
+                username=f'{USERNAME_PREFIX}{user_id}_'
+                         f'{self.fake.user_name()}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for user_id in ids
+        )
+        self._insert('users', User, users)
+        # Сигнал create_profile при bulk_create не срабатывает.
+        self._insert('profiles', Profile, (
+            Profile(user_id=user_id) for user_id in ids
+        ))
+        return list(ids)
+
+    def _groups(self):
+        count = self.counts['groups']
+        if not count:
+            return []
+        first = _next_id(Group)
+        groups = mixer.cycle(count).blend(
+            Group,
+            title=(self.fake.catch_phrase() for _ in range(count)),
+            slug=(f'load-{number}' for number in range(first, first + count)),
+            description=(self.fake.paragraph() for _ in range(count)),
+        )
+        return [group.id for group in groups]
+
+    def _text(self):
+        return ' '.join(self.rnd.sample(
+            self.sentences, self.rnd.randint(1, 6)
+        ))
+
+    def _post_date(self, number):
+        # Посты равномерно распределены по периоду, новые — с большим id.
+        span = timedelta(days=self.days)
+        offset = span * (number + 1) / max(self.counts['posts'], 1)
+        return self.now - span + offset
+
+    def _shuffled(self, items):
+        items = list(items)
+        self.rnd.shuffle(items)
+        return items
+
+    def _posts(self):
+        authors = Zipf(
+            self._shuffled(self.user_ids), ACTIVITY_SKEW, self.rnd
+        )
+        groups = Zipf(self.group_ids, GROUP_SKEW, self.rnd)
+        for number in range(self.counts['posts']):
+            pub_date = self._post_date(number)
+            group_id = None
+            if self.group_ids and self.rnd.random() >= NO_GROUP_SHARE:
+                group_id = groups.choice()
+            yield Post(
+                id=self.first_post + number,
+                text=self._text(),
+                author_id=authors.choice(),
+                group_id=group_id,
+                pub_date=pub_date,
+                modified=pub_date,
+            )
+
+    def _comments(self):
+        posts = self.counts['posts']
+        if not posts:
+            return
+        # Ранг 1 — самый свежий пост.
+        recent = Zipf(range(posts - 1, -1, -1), COMMENT_SKEW, self.rnd)
+        first = _next_id(Comment)
+        for number in range(self.counts['comments']):
+            post_number = recent.choice()
+            pub_date = min(
+                self._post_date(post_number)
+                + timedelta(minutes=self.rnd.expovariate(1 / 600)),
+                self.now,
+            )
+            yield Comment(
+                id=first + number,
+                post_id=self.first_post + post_number,
+                author_id=self.rnd.choice(self.user_ids),
+                text=self.rnd.choice(self.sentences),
+                pub_date=pub_date,
+            )
+
+    def _follows(self):
+        popular = Zipf(
+            self._shuffled(self.user_ids), POPULARITY_SKEW, self.rnd
+        )
+        limit = len(self.user_ids) - 1
+        for user_id in self.user_ids:
+            count = min(
+                int(self.rnd.expovariate(1 / self.follows_per_user)), limit
+            )
+            for author_id in popular.sample(count):
+                if author_id != user_id:
+                    yield Follow(user_id=user_id, author_id=author_id)
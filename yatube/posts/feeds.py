@@ -0,0 +1,288 @@
+"""Ленты RSS, Atom и JSON Feed: общая лента, группы и авторы.
+
+Лента собирается потоком (``StreamingHttpResponse`` поверх
+``.iterator()``) и по ходу отдачи складывается в кэш под текущим
+поколением ленты из ``posts.caching``. Пока поколение не сменилось,
+следующие клиенты получают готовый текст из кэша.
+
+``ETag`` — поколение ленты, ``Last-Modified`` — время сборки
+закэшированного текста. Опрос с ``If-None-Match`` или
+``If-Modified-Since`` для неизменившейся ленты получает ``304`` по
+двум чтениям кэша; лента группы или автора добавляет к ним одну
+проверку, что группа или автор существуют.
+"""
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.http import http_date
+from django.utils.text import Truncator
+
+from core.cache import get_generations, make_etag
+from core.routers import use_primary
+
+from . import caching
+from .api import JSON_PARAMS
+from .models import Group, Post
+from .views import FEED_ORDERING
+
+
+User = get_user_model()
+
+FEED_SIZE = 50
+FEED_KEY = 'syndication:{}'
+# Поколение сбрасывает ленту раньше; срок лишь освобождает кэш.
+FEED_TIMEOUT = 24 * 3600
+FEED_MAX_AGE = 60
+TITLE_LENGTH = 80
+FEED_FIELDS = (
+    'text', 'pub_date', 'modified', 'image',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__title',
+)
+
+
+class RSSFormat:
+    content_type = 'application/rss+xml; charset=utf-8'
+    separator = ''
+
+    def head(self, feed):
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+            f'<title>{escape(feed["title"])}</title>'
+            f'<link>{escape(feed["link"])}</link>'
+            f'<description>{escape(feed["description"])}</description>'
+            f'<atom:link href={quoteattr(feed["url"])} rel="self"/>'
+            '<language>ru</language>'
+            f'<lastBuildDate>{rfc2822_date(feed["updated"])}</lastBuildDate>'
+        )
+
+    def item(self, entry):
+        category = (
+            f'<category>{escape(entry["category"])}</category>'
+            if entry['category'] else ''
+        )
+        return (
+            f'<item><title>{escape(entry["title"])}</title>'
+            f'<link>{escape(entry["url"])}</link>'
+            f'<guid isPermaLink="true">{escape(entry["url"])}</guid>'
+            f'<description>{escape(entry["text"])}</description>'
+            f'<dc:creator>{escape(entry["author"])}</dc:creator>'
+            f'<pubDate>{rfc2822_date(entry["published"])}</pubDate>'
+            f'{category}</item>'
+        )
+
+    def tail(self):
+        return '</channel></rss>'
+
+
+class AtomFormat:
+    content_type = 'application/atom+xml; charset=utf-8'
+    separator = ''
+
+    def head(self, feed):
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="ru">'
+            f'<title>{escape(feed["title"])}</title>'
+            f'<subtitle>{escape(feed["description"])}</subtitle>'
+            f'<link href={quoteattr(feed["link"])} rel="alternate"/>'
+            f'<link href={quoteattr(feed["url"])} rel="self"/>'
+            f'<id>{escape(feed["link"])}</id>'
+            f'<updated>{rfc3339_date(feed["updated"])}</updated>'
+        )
+
+    def item(self, entry):
+        category = (
+            f'<category term={quoteattr(entry["category"])}/>'
+            if entry['category'] else ''
+        )
+        return (
+            f'<entry><title>{escape(entry["title"])}</title>'
+            f'<link href={quoteattr(entry["url"])} rel="alternate"/>'
+            f'<id>{escape(entry["url"])}</id>'
+            f'<published>{rfc3339_date(entry["published"])}</published>'
+            f'<updated>{rfc3339_date(entry["updated"])}</updated>'
+            f'<author><name>{escape(entry["author"])}</name></author>'
+            f'{category}'
+            f'<content type="text">{escape(entry["text"])}</content>'
+            '</entry>'
+        )
+
+    def tail(self):
+        return '</feed>'
+
+
+class JSONFeedFormat:
+    content_type = 'application/feed+json; charset=utf-8'
+    separator = ','
+
+    def head(self, feed):
+        head = json.dumps({
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': feed['title'],
+            'home_page_url': feed['link'],
+            'feed_url': feed['url'],
+            'description': feed['description'],
+            'language': 'ru',
+        }, **JSON_PARAMS)
+        return head[:-1] + ',"items":['
+
+    def item(self, entry):
+        item = {
+            'id': entry['url'],
+            'url': entry['url'],
+            'title': entry['title'],
+            'content_text': entry['text'],
+            'date_published': entry['published'].isoformat(),
+            'date_modified': entry['updated'].isoformat(),
+            'authors': [{'name': entry['author']}],
+        }
+        if entry['category']:
+            item['tags'] = [entry['category']]
+        if entry['image']:
+            item['image'] = entry['image']
+        return json.dumps(item, **JSON_PARAMS)
+
+    def tail(self):
+        return ']}'
+
+
+FORMATS = {
+    'rss': RSSFormat(),
+    'atom': AtomFormat(),
+    'json': JSONFeedFormat(),
+}
+
+
+def entry(request, post):
+    url = request.build_absolute_uri(
+        reverse('posts:post_detail', args=[post.id])
+    )
+    return {
+        'url': url,
+        'title': Truncator(post.text).chars(TITLE_LENGTH),
+        'text': post.text,
+        'author': post.author.get_full_name() or post.author.username,
+        'published': post.pub_date,
+        'updated': post.modified,
+        'category': post.group.title if post.group_id else None,
+        'image': (
+            request.build_absolute_uri(post.image.url) if post.image else None
+        ),
+    }
+
+
+def _stream(request, feed_format, feed, posts, key, built):
+    """Отдаёт ленту по частям и кэширует её целиком в конце."""
+    # Лента ложится в кэш под поколением, прочитанным до сборки:
+    # отставшая реплика закрепила бы в нём старые посты.
+    with use_primary():
+        parts = [feed_format.head(feed)]
+        yield parts[-1]
+        for index, post in enumerate(posts.iterator()):
+            chunk = feed_format.item(entry(request, post))
+            if index:
+                chunk = feed_format.separator + chunk
+            parts.append(chunk)
+            yield chunk
+    parts.append(feed_format.tail())
+    yield parts[-1]
+    cache.set(key, (built, ''.join(parts)), FEED_TIMEOUT)
+
+
+def feed_response(request, fmt, generation, build):
+    """Лента ``generation`` в формате ``fmt`` с conditional GET.
+
+    ``build()`` вызывается только при сборке и возвращает описание
+    ленты и queryset её постов.
+    """
+    feed_format = FORMATS.get(fmt)
+    if feed_format is None:
+        raise Http404
+    stamp = get_generations(generation)
+    key = FEED_KEY.format(hashlib.md5(
+        repr((fmt, generation, stamp, request.get_host())).encode()
+    ).hexdigest())
+    etag = make_etag(stamp, fmt, request.get_host())
+    cached = cache.get(key)
+    # Без текста в кэше дата сборки неизвестна: If-Modified-Since не
+    # проверяется, ETag — проверяется, он от сборки не зависит.
+    built = cached[0] if cached is not None else int(time.time())
+    response = get_conditional_response(
+        request, etag=etag,
+        last_modified=built if cached is not None else None,
+    )
+    if response is None and cached is not None:
+        response = HttpResponse(
+            cached[1], content_type=feed_format.content_type
+        )
+    if response is None:
+        feed, posts = build()
+        feed = dict(
+            feed,
+            link=request.build_absolute_uri(feed['link']),
+            url=request.build_absolute_uri(request.path),
+            updated=datetime.fromtimestamp(built, timezone.utc),
+        )
+        posts = posts.select_related('author', 'group').only(
+            *FEED_FIELDS
+        ).order_by(*FEED_ORDERING)[:FEED_SIZE]
+        response = StreamingHttpResponse(
+            _stream(request, feed_format, feed, posts, key, built),
+            content_type=feed_format.content_type,
+        )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(built)
+    response['Cache-Control'] = f'public, max-age={FEED_MAX_AGE}'
+    return response
+
+
+def index(request, fmt):
+    return feed_response(request, fmt, caching.INDEX_FEED, lambda: (
+        {
+            'title': 'Последние обновления на сайте',
+            'link': reverse('posts:index'),
+            'description': 'Новые посты всех авторов',
+        },
+        Post.objects.all(),
+    ))
+
+
+def group_posts(request, slug, fmt):
+    # Лента ищется до проверки ETag: по несуществующей — 404, а не 304
+    # на совпавшее поколение.
+    group = get_object_or_404(Group, slug=slug)
+
+    def build():
+        return {
+            'title': group.title,
+            'link': reverse('posts:group_list', args=[slug]),
+            'description': group.description,
+        }, Post.objects.filter(group=group)
+
+    return feed_response(request, fmt, caching.group_feed(slug), build)
+
+
+def profile(request, username, fmt):
+    author = get_object_or_404(User, username=username)
+
+    def build():
+        return {
+            'title': author.get_full_name() or author.username,
+            'link': reverse('posts:profile', args=[username]),
+            'description': f'Посты автора {author.username}',
+        }, Post.objects.filter(author=author)
+
+    return feed_response(request, fmt, caching.profile_feed(username), build)
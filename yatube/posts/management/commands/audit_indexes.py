@@ -0,0 +1,83 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts import timeline
+from posts.models import Comment, Group, Post, User
+from posts.paginators import CursorPaginator
+from posts.views import DISPLAYED_COUNT, FEED_ORDERING
+
+
+# SQLite: «SCAN posts_post» без индекса (до 3.36 — «SCAN TABLE
+# posts_post»); PostgreSQL: «Seq Scan on ...». Имя таблицы не может быть
+# словом TABLE: иначе при пропущенной группе «TABLE » оно сошло бы за
+# имя, и «SCAN TABLE t USING INDEX i» считался бы полным просмотром.
+FULL_SCAN = re.compile(
+    r'\bSCAN (?:TABLE )?(?!(?:TABLE|CONSTANT)\b)\w+\b'
+    r'(?! USING| VIRTUAL TABLE)|Seq Scan on \w+'
+)
+TEMP_SORT = re.compile(r'TEMP B-TREE|Sort Method')
+
+
+def feed_queries():
+    """Запросы лент в том виде, в каком их выполняют posts.views."""
+    user = User(id=0)
+    position = [timezone.now(), 0]
+    feeds = {
+        'index': (Post.objects.feed(), FEED_ORDERING),
+        'group_posts': (
+            Post.objects.for_group(Group(id=0)), FEED_ORDERING
+        ),
+        'profile': (Post.objects.for_author(user), FEED_ORDERING),
+        'follow_index': (
+            timeline.follow_feed(user, merged_authors=[]).feed(),
+            timeline.ORDERING,
+        ),
+        'follow_index merged': (
+            timeline.follow_feed(user, merged_authors=[0]).feed(),
+            timeline.ORDERING,
+        ),
+        'post_detail comments': (
+            Comment.objects.filter(post_id=0).with_authors(),
+            ('pub_date', 'id'),
+        ),
+    }
+    for name, (queryset, ordering) in feeds.items():
+        paginator = CursorPaginator(queryset, DISPLAYED_COUNT, ordering)
+        limit = DISPLAYED_COUNT + 1
+        yield name, paginator.page_queryset()[:limit]
+        yield f'{name} (cursor)', paginator.page_queryset(position)[:limit]
+        yield f'{name} (back)', paginator.page_queryset(
+            position, backwards=True
+        )[:limit]
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для запросов лент и завершается ошибкой, '
+        'если какой-то из них читает таблицу целиком.'
+    )
+
+    def handle(self, *args, **options):
+        full_scans = []
+        for name, queryset in feed_queries():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if FULL_SCAN.search(plan):
+                full_scans.append(name)
+            elif TEMP_SORT.search(plan):
+                self.stdout.write(self.style.WARNING(
+                    'Сортировка во временной структуре'
+                ))
+        if full_scans:
+            raise CommandError(
+                'Полный просмотр таблицы ({}): {}'.format(
+                    connection.vendor, ', '.join(full_scans)
+                )
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Все запросы лент используют индексы'
+        ))
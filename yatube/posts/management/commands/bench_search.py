@@ -0,0 +1,119 @@
+import statistics
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from core import bench
+from posts import search
+from posts.models import Post
+from posts.paginators import CursorPaginator
+from posts.views import DISPLAYED_COUNT, FEED_ORDERING
+
+
+# По скольким последним постам выбираются слова запросов.
+SAMPLE_POSTS = 2000
+LIKE = 'like'
+
+
+def _vocabulary(sample=SAMPLE_POSTS):
+    """Слова постов от частых к редким."""
+    texts = Post.objects.order_by('-id').values_list(
+        'text', flat=True
+    )[:sample]
+    counts = Counter(
+        term for text in texts for term in search.tokenize(text)
+        if len(term) > 3
+    )
+    return [term for term, _ in counts.most_common()]
+
+
+def queries(vocabulary):
+    """Частое слово, слово средней частоты, редкое и пара слов."""
+    if len(vocabulary) < 2:
+        raise CommandError(
+            'Нет данных для замера: сначала выполните generate_dataset'
+        )
+    middle = vocabulary[len(vocabulary) // 10]
+    return {
+        'частое': vocabulary[0],
+        'среднее': middle,
+        'редкое': vocabulary[-1],
+        'два слова': f'{vocabulary[1]} {middle}',
+    }
+
+
+def _like(query):
+    posts = Post.objects.feed()
+    for term in search.tokenize(query):
+        posts = posts.filter(text__icontains=term)
+    return CursorPaginator(posts, DISPLAYED_COUNT, FEED_ORDERING)
+
+
+def paginator(backend, query):
+    """Выдача, как её листает страница поиска."""
+    if backend == LIKE:
+        return _like(query)
+    with override_settings(SEARCH_BACKEND=backend):
+        results = search.search(query)
+    return CursorPaginator(results, DISPLAYED_COUNT, search.ORDERING)
+
+
+def measure(backend, query, repeat):
+    """Первая и вторая страницы выдачи: время, строки и запросы."""
+    def run():
+        pages = paginator(backend, query)
+        first = pages.get_page(None)
+        if first.has_next():
+            list(pages.get_page(first.next_cursor))
+
+    timings = bench.timings(run, repeat)
+    with CaptureQueriesContext(connection) as captured:
+        first = paginator(backend, query).get_page(None)
+    return {
+        'p50_ms': statistics.median(timings),
+        'p95_ms': bench.percentile(timings, .95),
+        'rows': len(first),
+        'queries': len(captured),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет posts.search.search() на данных текущей базы '
+        '(generate_dataset): первую и вторую страницы выдачи, как их '
+        'листает страница поиска, для бэкендов поиска и LIKE. Индекс '
+        'бэкенда должен быть построен (rebuild_search_index).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--backends',
+            help='Через запятую из: {}; по умолчанию текущий и {}.'.format(
+                ', '.join((LIKE, *search.BACKENDS)), LIKE
+            ),
+        )
+        parser.add_argument('--sample', type=int, default=SAMPLE_POSTS)
+
+    def handle(self, *args, **options):
+        if options['backends']:
+            backends = options['backends'].split(',')
+        else:
+            backends = [search.get_backend().name, LIKE]
+        unknown = set(backends) - {LIKE, *search.BACKENDS}
+        if unknown:
+            raise CommandError(
+                'Неизвестные бэкенды: ' + ', '.join(sorted(unknown))
+            )
+        self.stdout.write(f'Постов в базе: {Post.objects.count():,}')
+        for label, query in queries(_vocabulary(options['sample'])).items():
+            for backend in backends:
+                result = measure(backend, query, options['repeat'])
+                self.stdout.write(
+                    '{:>10} {:>6}: p50 {p50_ms:.2f} мс, p95 {p95_ms:.2f} мс, '
+                    'строк {rows}, запросов {queries} ({})'.format(
+                        label, backend, query, **result
+                    )
+                )
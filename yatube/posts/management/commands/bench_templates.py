@@ -0,0 +1,215 @@
+import os
+import statistics
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template import engines
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import bench
+from posts import counters, timeline
+from posts.forms import CommentForm, PostForm
+from posts.models import Post
+from posts.views import comments_page, makes_paginator
+
+from .bench_views import heaviest
+
+
+BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'templates.json')
+TOLERANCE = 0.25
+# Рендер шаблона короче запроса страницы: и порог шума ниже.
+MIN_DELTA_MS = 0.5
+
+
+def _request(url, user):
+    request = RequestFactory(HTTP_HOST=bench.host()).get(url)
+    request.user = user or AnonymousUser()
+    return request
+
+
+def _page(request, posts, **options):
+    page = makes_paginator(request, posts, keyset=True, **options)
+    # Посты читаются до замера: меряется рендер, а не запрос ленты.
+    page.object_list = list(page.object_list)
+    return page
+
+
+def contexts():
+    """Шаблоны страниц с контекстами, как их собирают представления."""
+    objects = heaviest()
+    group, author, reader = (
+        objects['group'], objects['author'], objects['reader']
+    )
+    post = Post.objects.detail().get(id=objects['post_id'])
+
+    def index(request):
+        return {'page_obj': _page(request, Post.objects.feed())}
+
+    def group_list(request):
+        return {
+            'group': group,
+            'page_obj': _page(request, Post.objects.for_group(group)),
+        }
+
+    def profile(request):
+        profile = counters.profile_for(author)
+        return {
+            'author': author,
+            'profile': profile,
+            'posts_count': profile.posts_count,
+            'page_obj': _page(request, Post.objects.for_author(author)),
+            'following': False,
+        }
+
+    def post_detail(request):
+        comments = comments_page(request, post)
+        comments.object_list = list(comments.object_list)
+        return {
+            'post': post,
+            'posts_count': counters.profile_for(post.author).posts_count,
+            'comments': comments,
+            'more_comments_url': None,
+            'form': CommentForm(),
+        }
+
+    def follow(request):
+        return {'page_obj': _page(
+            request, timeline.follow_feed(reader).feed(),
+            ordering=timeline.ORDERING,
+        )}
+
+    def create_post(request):
+        return {'form': PostForm()}
+
+    return {
+        'posts/index.html': (reverse('posts:index'), None, index),
+        'posts/group_list.html': (
+            reverse('posts:group_list', args=[group.slug]), None, group_list
+        ),
+        'posts/profile.html': (
+            reverse('posts:profile', args=[author.username]), None, profile
+        ),
+        'posts/post_detail.html': (
+            reverse('posts:post_detail', args=[post.id]), reader,
+            post_detail,
+        ),
+        'posts/follow.html': (
+            reverse('posts:follow_index'), reader, follow
+        ),
+        'posts/create_post.html': (
+            reverse('posts:post_create'), reader, create_post
+        ),
+    }
+
+
+def measure(name, request, context, repeat, warmup, cold):
+    """Время загрузки и рендера шаблона и запросы во время рендера."""
+    engine = engines['django']
+
+    def render():
+        if cold:
+            cache.clear()
+        engine.get_template(name).render(context, request)
+
+    timings = bench.timings(render, repeat, warmup)
+    with CaptureQueriesContext(connection) as queries:
+        render()
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p99_ms': round(bench.percentile(timings, .99), 3),
+        'queries': len(queries),
+    }
+
+
+def _loaders():
+    loaders = engines['django'].engine.loaders
+    return [
+        loader if isinstance(loader, str) else loader[0]
+        for loader in loaders
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет загрузку и рендер шаблонов страниц с контекстами, как у '
+        'представлений (p50/p99, запросы во время рендера), и сравнивает '
+        'с базовой линией. Загрузчики — из текущих настроек: профиль '
+        'продакшена — --settings yatube.settings_prod.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Не очищать кэш фрагментов перед каждым рендером.',
+        )
+        parser.add_argument('--baseline', default=BASELINE)
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Записать результаты как новую базовую линию.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=TOLERANCE,
+            help='Допустимый относительный рост медианы.',
+        )
+        parser.add_argument(
+            '--templates', help='Через запятую; по умолчанию все.'
+        )
+
+    def handle(self, *args, **options):
+        pages = contexts()
+        if options['templates']:
+            names = options['templates'].split(',')
+            unknown = set(names) - pages.keys()
+            if unknown:
+                raise CommandError(
+                    'Неизвестные шаблоны: ' + ', '.join(sorted(unknown))
+                )
+            pages = {name: pages[name] for name in names}
+        self.stdout.write('Загрузчики: ' + ', '.join(_loaders()))
+        results = {}
+        for name, (url, user, build) in pages.items():
+            request = _request(url, user)
+            results[name] = measure(
+                name, request, build(request), options['repeat'],
+                options['warmup'], cold=not options['warm_cache'],
+            )
+            self.stdout.write(
+                '{:>24}: p50 {p50_ms:.3f} мс, p99 {p99_ms:.3f} мс, '
+                'запросов {queries}'.format(name, **results[name])
+            )
+        path = options['baseline']
+        if options['save']:
+            bench.save_baseline(path, {
+                'meta': {
+                    'loaders': _loaders(),
+                    'cold_cache': not options['warm_cache'],
+                },
+                'templates': results,
+            })
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовая линия сохранена в {path}'
+            ))
+            return
+        baseline = bench.load_baseline(path)
+        if baseline is None:
+            self.stdout.write(self.style.WARNING(
+                f'Базовой линии {path} нет; сохраните её с --save'
+            ))
+            return
+        regressions = bench.compare(
+            results, baseline['templates'], options['tolerance'],
+            min_delta_ms=MIN_DELTA_MS,
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно базовой линии:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Хуже базовой линии не стало'))
@@ -0,0 +1,187 @@
+import os
+import platform
+import statistics
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import bench
+from posts.models import Comment, Group, Post, Profile
+
+
+BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'views.json')
+# Допустимый рост медианы и памяти относительно базовой линии. p99 на
+# десятках повторов — почти максимум, он печатается, но не проверяется.
+TOLERANCE = 0.25
+METRICS = ('p50_ms', 'p99_ms', 'queries', 'peak_kb')
+
+
+def heaviest():
+    """Самые тяжёлые группа, автор, читатель и пост набора данных."""
+    hot_group = Group.objects.order_by('-posts_count').first()
+    popular = Profile.objects.select_related('user').order_by(
+        '-followers_count'
+    ).first()
+    reader = Profile.objects.select_related('user').order_by(
+        '-following_count'
+    ).first()
+    discussed = Comment.objects.values('post_id').annotate(
+        total=Count('id')
+    ).order_by('-total').first()
+    if not (hot_group and popular and reader and discussed):
+        raise CommandError(
+            'Нет данных для замера: сначала выполните generate_dataset'
+        )
+    return {
+        'group': hot_group,
+        'author': popular.user,
+        'reader': reader.user,
+        'post_id': discussed['post_id'],
+    }
+
+
+def targets():
+    """Страницы для замера: самые тяжёлые ленты набора данных."""
+    objects = heaviest()
+    return {
+        'index': (reverse('posts:index'), None),
+        'group_posts': (
+            reverse('posts:group_list', args=[objects['group'].slug]), None
+        ),
+        'profile': (
+            reverse('posts:profile', args=[objects['author'].username]),
+            None,
+        ),
+        'post_detail': (
+            reverse('posts:post_detail', args=[objects['post_id']]), None
+        ),
+        'follow_index': (reverse('posts:follow_index'), objects['reader']),
+    }
+
+
+def measure(client, url, repeat, warmup, cold):
+    """Задержки, число запросов и пик памяти для одной страницы."""
+    def request():
+        if cold:
+            cache.clear()
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: статус {response.status_code}')
+
+    timings = bench.timings(request, repeat, warmup)
+    # Память и запросы — отдельным проходом: tracemalloc замедляет код.
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        try:
+            request()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p99_ms': round(bench.percentile(timings, .99), 2),
+        'queries': len(queries),
+        'peak_kb': round(peak / 1024),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет index, group_posts, profile, post_detail и follow_index '
+        'на текущей базе (p50/p99, число запросов, пик памяти) и '
+        'сравнивает с сохранённой базовой линией.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Не очищать кэш страниц перед каждым запросом.',
+        )
+        parser.add_argument('--baseline', default=BASELINE)
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Записать результаты как новую базовую линию.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=TOLERANCE,
+            help='Допустимый относительный рост метрик.',
+        )
+        parser.add_argument(
+            '--views', help='Через запятую; по умолчанию все.'
+        )
+
+    def handle(self, *args, **options):
+        pages = targets()
+        if options['views']:
+            names = options['views'].split(',')
+            unknown = set(names) - pages.keys()
+            if unknown:
+                raise CommandError(
+                    'Неизвестные страницы: ' + ', '.join(sorted(unknown))
+                )
+            pages = {name: pages[name] for name in names}
+        results = {}
+        for name, (url, user) in pages.items():
+            client = Client(HTTP_HOST=bench.host())
+            if user is not None:
+                client.force_login(user)
+            results[name] = measure(
+                client, url, options['repeat'], options['warmup'],
+                cold=not options['warm_cache'],
+            )
+            self.stdout.write(
+                '{:>13}: p50 {p50_ms:.2f} мс, p99 {p99_ms:.2f} мс, '
+                'запросов {queries}, память {peak_kb} КБ'.format(
+                    name, **results[name]
+                )
+            )
+        path = options['baseline']
+        if options['save']:
+            bench.save_baseline(path, {
+                'meta': {
+                    'posts': Post.objects.count(),
+                    'users': Profile.objects.count(),
+                    'python': platform.python_version(),
+                    'database': connection.vendor,
+                    'cold_cache': not options['warm_cache'],
+                },
+                'views': results,
+            })
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовая линия сохранена в {path}'
+            ))
+            return
+        baseline = bench.load_baseline(path)
+        if baseline is None:
+            self.stdout.write(self.style.WARNING(
+                f'Базовой линии {path} нет; сохраните её с --save'
+            ))
+            return
+        for name, current in results.items():
+            previous = baseline['views'].get(name)
+            if previous is not None:
+                self.stdout.write('{:>13}: {}'.format(name, ', '.join(
+                    f'{metric} {previous[metric]} → {current[metric]}'
+                    for metric in METRICS
+                )))
+        regressions = bench.compare(
+            results, baseline['views'], options['tolerance'],
+            metrics=('p50_ms', 'peak_kb'),
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно базовой линии:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Хуже базовой линии не стало'
+        ))
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии или подписки в NDJSON или CSV, '
+        'читая таблицу порциями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument(
+            '--output', default='-', help='Файл или «-» для stdout.'
+        )
+        parser.add_argument('--format', choices=bulk.FORMATS)
+        parser.add_argument(
+            '--batch-size', type=int, default=bulk.BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        output = options['output']
+        fmt = options['format'] or bulk.detect_format(output)
+        # Прогресс идёт в stderr, чтобы не смешиваться с данными в stdout.
+        progress = bulk.Progress(kind, self.stderr.write)
+        stream = (
+            sys.stdout if output == '-'
+            else open(output, 'w', encoding='utf-8', newline='')
+        )
+        rows = bulk.export_rows(kind, options['batch_size'])
+        try:
+            bulk.write_records(
+                stream, fmt, kind, self._counted(rows, progress)
+            )
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        self.stderr.write(progress.summary())
+
+    def _counted(self, rows, progress):
+        for row in rows:
+            yield row
+            progress.add(1)
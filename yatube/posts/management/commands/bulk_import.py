@@ -0,0 +1,68 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты, комментарии или подписки из NDJSON или CSV '
+        'порциями через bulk_create, затем пересчитывает счётчики, '
+        'поисковый индекс и ленты подписок затронутых авторов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument('path', help='Файл или «-» для stdin.')
+        parser.add_argument('--format', choices=bulk.FORMATS)
+        parser.add_argument(
+            '--batch-size', type=int, default=bulk.BATCH_SIZE
+        )
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересчитывать производные данные (при импорте '
+                 'нескольких файлов подряд последний импортируется с '
+                 '--full-rebuild).',
+        )
+        parser.add_argument(
+            '--full-rebuild', action='store_true',
+            help='Собрать ленты подписок всех авторов и сбросить кэш '
+                 'всех профилей, а не только затронутых файлом.',
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        path = options['path']
+        fmt = options['format'] or bulk.detect_format(path)
+        importer = bulk.Importer(kind, options['batch_size'])
+        progress = bulk.Progress(kind, self.stdout.write)
+        stream = (
+            sys.stdin if path == '-'
+            else open(path, encoding='utf-8', newline='')
+        )
+        try:
+            try:
+                importer.run(bulk.read_records(stream, fmt), progress)
+            except (ValueError, IntegrityError, KeyError) as error:
+                # ValueError: InvalidRecord, битый JSON, нечисловой id.
+                raise CommandError(
+                    f'Импорт остановлен после {progress.count} строк: '
+                    f'{error!r}'
+                )
+            finally:
+                if stream is not sys.stdin:
+                    stream.close()
+            self.stdout.write(self.style.SUCCESS(progress.summary()))
+        finally:
+            # Порции фиксируются по одной: зафиксированные до ошибки
+            # пересчитываются так же, как при успешном импорте.
+            if progress.count and not options['skip_rebuild']:
+                self.finish(importer, options['full_rebuild'])
+
+    def finish(self, importer, full_rebuild):
+        if full_rebuild:
+            bulk.finish_import(bulk.KINDS, self.stdout.write)
+        else:
+            bulk.finish_import([importer.kind], self.stdout.write, importer)
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import bulk, dataset
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками с перекошенными распределениями '
+        'для нагрузочных замеров (bench_views).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=dataset.USERS)
+        parser.add_argument('--posts', type=int, default=dataset.POSTS)
+        parser.add_argument('--groups', type=int, default=dataset.GROUPS)
+        parser.add_argument(
+            '--comments', type=int, default=dataset.COMMENTS
+        )
+        parser.add_argument(
+            '--follows-per-user', type=int,
+            default=dataset.FOLLOWS_PER_USER,
+            help='Среднее число подписок пользователя.',
+        )
+        parser.add_argument('--days', type=int, default=dataset.DAYS)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size', type=int, default=bulk.BATCH_SIZE
+        )
+        parser.add_argument(
+            '--append', action='store_true',
+            help='Добавить данные в непустую базу.',
+        )
+
+    def handle(self, *args, **options):
+        if Post.objects.exists() and not options['append']:
+            raise CommandError(
+                'В базе уже есть посты; замеры на смешанных данных '
+                'несопоставимы. Используйте пустую базу или --append.'
+            )
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь')
+        generator = dataset.Generator(
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            comments=options['comments'],
+            follows_per_user=options['follows_per_user'],
+            days=options['days'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            write=self.stdout.write,
+        )
+        created = generator.run()
+        bulk.finish_import(bulk.KINDS, self.stdout.write)
+        self.stdout.write(self.style.SUCCESS('Создано: ' + ', '.join(
+            f'{kind} {count:,}' for kind, count in created.items()
+        )))
@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def _generate(name):
+    try:
+        return thumbnails.generate(name)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры карточек для всех постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=thumbnails.WORKERS,
+            help='Число параллельных потоков.',
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).order_by().distinct()
+        started = time.monotonic()
+        created = done = 0
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(options['workers']) as executor:
+                results = executor.map(_generate, names.iterator())
+                for done, result in enumerate(results, 1):
+                    created += result
+                    if done % 100 == 0:
+                        self.stdout.write(f'Обработано картинок: {done}')
+        else:
+            for done, name in enumerate(names.iterator(), 1):
+                created += thumbnails.generate(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {done}, создано миниатюр: {created} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,65 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:55
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+def remove_invalid_follows(apps, schema_editor):
+    """Убирает дубли и подписки на себя, мешающие новым ограничениям."""
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('posts', 'Profile')
+    seen = set()
+    invalid = []
+    touched = set()
+    for follow in Follow.objects.order_by('id').iterator():
+        key = (follow.user_id, follow.author_id)
+        if key in seen or follow.user_id == follow.author_id:
+            invalid.append(follow.id)
+            touched.update(key)
+        seen.add(key)
+    Follow.objects.filter(id__in=invalid).delete()
+    for profile in Profile.objects.filter(user_id__in=touched):
+        profile.followers_count = Follow.objects.filter(
+            author_id=profile.user_id
+        ).count()
+        profile.following_count = Follow.objects.filter(
+            user_id=profile.user_id
+        ).count()
+        profile.save(update_fields=['followers_count', 'following_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'pub_date', 'id'], name='comment_post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_pub_date_idx'),
+        ),
+        migrations.RunPython(
+            remove_invalid_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='prevent_self_follow'),
+        ),
+    ]
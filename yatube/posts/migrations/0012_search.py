@@ -0,0 +1,80 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:07
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+import django.db.models.deletion
+
+# Копия posts.search.FTS_SCHEMA на момент миграции.
+FTS_SCHEMA = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5('
+    'text, group_title, author_name, '
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+
+def _normalize(text):
+    return text.lower().replace('ё', 'е')
+
+
+def _author(post):
+    author = post.author
+    names = (author.first_name, author.last_name, author.username)
+    return ' '.join(filter(None, names))
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(FTS_SCHEMA)
+    except OperationalError:
+        # SQLite собран без FTS5: поиск пойдёт по SearchTerm, который
+        # заполняет команда rebuild_search_index.
+        return
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.select_related('author', 'group').order_by('id')
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_search '
+            '(rowid, text, group_title, author_name) '
+            'VALUES (%s, %s, %s, %s)',
+            [
+                (
+                    post.id,
+                    _normalize(post.text),
+                    _normalize(post.group.title if post.group_id else ''),
+                    _normalize(_author(post)),
+                )
+                for post in posts.iterator()
+            ],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Терм')),
+                ('weight', models.FloatField(verbose_name='Вес')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post', verbose_name='Пост')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_term'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, help_text='Основа Last-Modified страницы группы', verbose_name='Дата изменения'),
+        ),
+    ]
@@ -11,11 +11,44 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0
+    )
+    modified = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        help_text='Основа Last-Modified страницы группы'
+    )
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # Всё, что читает карточка поста; остальное не загружается.
+    CARD_FIELDS = (
+        'text', 'pub_date', 'modified', 'image', 'version',
+        'author', 'author__username',
+        'author__first_name', 'author__last_name',
+        'group', 'group__slug',
+    )
+
+    def feed(self):
+        """Посты для лент: автор и группа тем же запросом."""
+        return self.select_related('author', 'group').only(*self.CARD_FIELDS)
+
+    def for_group(self, group):
+        return self.feed().filter(group=group)
+
+    def for_author(self, author):
+        return self.feed().filter(author=author)
+
+    def detail(self):
+        """Пост для страницы поста вместе со счётчиками автора."""
+        return self.select_related('author__profile', 'group')
+
+
 class Post(CreatedModel):
     SYM_COUNT = 15
     text = models.TextField(
@@ -42,12 +75,56 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False,
+        help_text='Растёт при каждом изменении, входит в ключ кэша карточки'
+    )
+    modified = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        help_text='Основа Last-Modified страниц с постом'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:self.SYM_COUNT]
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(fields=['modified'], name='post_modified_idx'),
+            models.Index(
+                fields=['author', 'modified'],
+                name='post_author_modified_idx',
+            ),
+            models.Index(
+                fields=['group', 'modified'],
+                name='post_group_modified_idx',
+            ),
+        ]
+
+
+class CommentQuerySet(models.QuerySet):
+    def with_authors(self):
+        """Комментарии в порядке написания вместе с авторами."""
+        return self.select_related('author').only(
+            'post', 'text', 'pub_date', 'author', 'author__username'
+        ).order_by('pub_date', 'id')
 
 
 class Comment(CreatedModel):
@@ -67,6 +144,16 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date', 'id'],
+                name='comment_post_pub_date_idx',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -81,7 +168,91 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор',
     )
-    models.UniqueConstraint(
-        fields=['user', 'author'],
-        name='unique_follow'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='prevent_self_follow'
+            ),
+        ]
+
+
+class Profile(models.Model):
+    """Счётчики автора, обновляемые вместе с записью данных."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
     )
+    following_count = models.PositiveIntegerField(
+        'Число подписок', default=0
+    )
+
+    def __str__(self):
+        return f'Профиль {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+
+
+class SearchTerm(models.Model):
+    """Запись обратного индекса поиска: терм и его вес в посте."""
+    MAX_LENGTH = 64
+
+    term = models.CharField('Терм', max_length=MAX_LENGTH)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Пост',
+    )
+    weight = models.FloatField('Вес')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'],
+                name='unique_search_term',
+            ),
+        ]
@@ -0,0 +1,195 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import (
+    FieldDoesNotExist, FieldError, ValidationError
+)
+from django.db.models import FloatField, IntegerField, Q
+from django.utils.functional import cached_property
+
+
+# Поля, значения которых в токене должны быть числами JSON.
+NUMERIC_FIELDS = (FloatField, IntegerField)
+
+
+class InvalidCursor(Exception):
+    """Курсор не удалось разобрать."""
+
+
+def _split(field):
+    if field.startswith('-'):
+        return field[1:], True
+    return field, False
+
+
+class CursorPaginator:
+    """Паджинатор по ключу (keyset) вместо OFFSET.
+
+    Страница выбирается условием по полям сортировки последней
+    показанной записи, поэтому её стоимость не зависит от глубины.
+    Последнее поле сортировки должно быть уникальным.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [_split(field) for field in self.ordering]
+
+    @cached_property
+    def count(self):
+        """Общее число записей. Считается только по запросу."""
+        return self.object_list.count()
+
+    def encode_cursor(self, obj, reverse=False):
+        values = []
+        for name, _ in self.fields:
+            value = getattr(obj, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        payload = json.dumps([values, int(reverse)], separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode())
+        return token.decode().rstrip('=')
+
+    def _field(self, name):
+        """Поле модели или выходное поле аннотации (ранг, дата ленты)."""
+        try:
+            return self.object_list.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            pass
+        annotation = self.object_list.query.annotations.get(name)
+        try:
+            return annotation.output_field
+        except (AttributeError, FieldError):
+            return None
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            values, reverse = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode()
+            )
+        except (ValueError, TypeError, binascii.Error):
+            raise InvalidCursor(token)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor(token)
+        parsed = []
+        for (name, _), value in zip(self.fields, values):
+            field = self._field(name)
+            if field is None or isinstance(field, NUMERIC_FIELDS):
+                # Число кладётся в токен числом; строку '1' или True
+                # to_python принял бы, поэтому тип проверяется здесь.
+                if isinstance(value, bool) or not isinstance(
+                    value, (int, float)
+                ):
+                    raise InvalidCursor(token)
+                if field is None:
+                    parsed.append(value)
+                    continue
+            # Токен собран клиентом: вместо даты может прийти число или
+            # список, и to_python падает не только с ValidationError.
+            try:
+                value = field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise InvalidCursor(token)
+            if value is None:
+                raise InvalidCursor(token)
+            parsed.append(value)
+        return parsed, bool(reverse)
+
+    def _seek(self, values, backwards):
+        """Условие «строго после» (или «строго до») заданной позиции."""
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        # Нестрогая граница по первому полю даёт базе диапазон по индексу.
+        name, descending = self.fields[0]
+        lookup = 'lte' if descending != backwards else 'gte'
+        return Q(**{f'{name}__{lookup}': values[0]}) & condition
+
+    def _ordered(self, backwards=False):
+        if not backwards:
+            return self.object_list.order_by(*self.ordering)
+        return self.object_list.order_by(*(
+            name if descending else f'-{name}'
+            for name, descending in self.fields
+        ))
+
+    def page_queryset(self, values=None, backwards=False):
+        """Запрос строк после позиции ``values`` (без среза)."""
+        queryset = self._ordered(backwards)
+        if values is None:
+            return queryset
+        return queryset.filter(self._seek(values, backwards))
+
+    def _fetch(self, queryset):
+        rows = list(queryset[:self.per_page + 1])
+        return rows[:self.per_page], len(rows) > self.per_page
+
+    def first_page(self):
+        rows, has_more = self._fetch(self.page_queryset())
+        next_cursor = self.encode_cursor(rows[-1]) if has_more else None
+        return CursorPage(rows, self, next_cursor, None)
+
+    def get_page(self, cursor):
+        """Возвращает страницу; битый или пустой курсор — первая страница."""
+        if not cursor:
+            return self.first_page()
+        try:
+            values, backwards = self.decode_cursor(cursor)
+        except InvalidCursor:
+            return self.first_page()
+        rows, has_more = self._fetch(self.page_queryset(values, backwards))
+        if not backwards:
+            next_cursor = self.encode_cursor(rows[-1]) if has_more else None
+            previous_cursor = (
+                self.encode_cursor(rows[0], reverse=True) if rows else None
+            )
+            return CursorPage(rows, self, next_cursor, previous_cursor)
+        if not has_more:
+            # До начала ленты меньше страницы — показываем первую целиком.
+            return self.first_page()
+        rows.reverse()
+        return CursorPage(
+            rows,
+            self,
+            self.encode_cursor(rows[-1]),
+            self.encode_cursor(rows[0], reverse=True),
+        )
+
+
+class CursorPage:
+    """Страница паджинатора по ключу; общего числа страниц не знает."""
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
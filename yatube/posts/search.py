@@ -0,0 +1,266 @@
+"""Полнотекстовый поиск по постам.
+
+Ищется текст поста, название группы и имя автора. Индекс обновляется
+сигналами вместе с записью постов, групп и пользователей, поэтому
+поиск не читает таблицу постов целиком, как ``LIKE '%...%'``.
+
+На SQLite с FTS5 документы лежат в виртуальной таблице
+``posts_search`` и ранжируются bm25. На остальных базах используется
+обратный индекс ``SearchTerm``: термы и их веса считает Python, а
+ранг (сумма весов с поправкой на редкость терма) — база. Бэкенд можно
+выбрать явно настройкой ``SEARCH_BACKEND`` (``'fts5'`` или ``'terms'``).
+
+Результаты упорядочены по ``('-rank', '-id')`` и листаются
+``CursorPaginator``.
+"""
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Sum, When
+from django.db.models.expressions import RawSQL
+
+from .models import Post, SearchTerm
+
+
+FTS_TABLE = 'posts_search'
+FTS_SCHEMA = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    'text, group_title, author_name, '
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+# Совпадение в названии группы или имени автора весит больше текста.
+FIELD_WEIGHTS = (1.0, 2.0, 2.0)
+ORDERING = ('-rank', '-id')
+# Длинные запросы обрезаются: каждый терм — отдельный проход индекса.
+MAX_TERMS = 8
+BATCH_SIZE = 500
+# Число постов для idf берётся из кэша: COUNT(*) на каждый поиск
+# читает всю таблицу, а на веса слабо влияет даже заметное отставание.
+DOCUMENTS_KEY = 'search:documents'
+DOCUMENTS_TIMEOUT = 600
+
+WORD = re.compile(r'\w+')
+
+_fts5_tables = {}
+
+
+def normalize(text):
+    return text.lower().replace('ё', 'е')
+
+
+def tokenize(text):
+    """Термы строки в порядке появления, без повторов."""
+    return list(dict.fromkeys(WORD.findall(normalize(text))))
+
+
+def document(text, group_title, first_name, last_name, username):
+    """Поля документа индекса: текст, группа, автор."""
+    author = ' '.join(filter(None, (first_name, last_name, username)))
+    return tuple(normalize(value) for value in (text, group_title, author))
+
+
+def post_document(post):
+    group_title = post.group.title if post.group_id else ''
+    author = post.author
+    return document(
+        post.text, group_title,
+        author.first_name, author.last_name, author.username,
+    )
+
+
+def term_weights(fields):
+    """Вес каждого терма документа: частота с убыванием и вес поля."""
+    weights = Counter()
+    for value, field_weight in zip(fields, FIELD_WEIGHTS):
+        for term, count in Counter(WORD.findall(value)).items():
+            weights[term] += field_weight * (1 + math.log(count))
+    return weights
+
+
+class FTS5Backend:
+    name = 'fts5'
+
+    def index(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(post_id,) for post_id, _ in documents],
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} '
+                '(rowid, text, group_title, author_name) '
+                'VALUES (%s, %s, %s, %s)',
+                [(post_id, *fields) for post_id, fields in documents],
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(post_id,) for post_id in post_ids],
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, queryset, terms):
+        # Термы состоят из \w, поэтому кавычки внутри невозможны.
+        match = ' '.join(f'"{term}"' for term in terms)
+        weights = ', '.join(str(weight) for weight in FIELD_WEIGHTS)
+        table = Post._meta.db_table
+        # Таблица индекса присоединяется один раз: MATCH выполняется
+        # однажды на запрос, а bm25 считается по найденной строке.
+        # Ранг в подзапросе повторял бы MATCH для каждого поста.
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = {table}.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[match],
+        ).annotate(rank=RawSQL(
+            f'-bm25({FTS_TABLE}, {weights})', [], output_field=FloatField()
+        ))
+
+
+class TermsBackend:
+    name = 'terms'
+
+    def index(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        self.remove(post_id for post_id, _ in documents)
+        SearchTerm.objects.bulk_create(
+            [
+                SearchTerm(term=term[:SearchTerm.MAX_LENGTH],
+                           post_id=post_id, weight=weight)
+                for post_id, fields in documents
+                for term, weight in term_weights(fields).items()
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def remove(self, post_ids):
+        SearchTerm.objects.filter(post_id__in=list(post_ids)).delete()
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+        cache.delete(DOCUMENTS_KEY)
+
+    def search(self, queryset, terms):
+        terms = [term[:SearchTerm.MAX_LENGTH] for term in terms]
+        frequencies = dict(
+            SearchTerm.objects.filter(term__in=terms)
+            .values_list('term').annotate(total=Count('id')).order_by()
+        )
+        if len(frequencies) < len(terms):
+            return queryset.none()
+        documents = cache.get_or_set(
+            DOCUMENTS_KEY, Post.objects.count, DOCUMENTS_TIMEOUT
+        )
+        # Редкий терм весит больше частого (idf).
+        idf = {
+            term: math.log(1 + documents / total)
+            for term, total in frequencies.items()
+        }
+        return queryset.filter(search_terms__term__in=terms).annotate(
+            matched=Count('search_terms'),
+            rank=Sum(Case(
+                *[
+                    When(
+                        search_terms__term=term,
+                        then=F('search_terms__weight') * weight,
+                    )
+                    for term, weight in idf.items()
+                ],
+                output_field=FloatField(),
+            )),
+        ).filter(matched=len(terms))
+
+
+BACKENDS = {
+    FTS5Backend.name: FTS5Backend,
+    TermsBackend.name: TermsBackend,
+}
+
+
+def fts5_available():
+    """Есть ли в текущей базе таблица FTS5 (создаётся миграцией)."""
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts5_tables:
+        with connection.cursor() as cursor:
+            _fts5_tables[name] = (
+                FTS_TABLE in connection.introspection.table_names(cursor)
+            )
+    return _fts5_tables[name]
+
+
+def get_backend():
+    name = getattr(settings, 'SEARCH_BACKEND', None)
+    if not name:
+        name = FTS5Backend.name if fts5_available() else TermsBackend.name
+    return BACKENDS[name]()
+
+
+def _documents(posts):
+    for post in posts:
+        yield post.id, post_document(post)
+
+
+def index_posts(posts):
+    """Переиндексирует посты (итерируемое или queryset)."""
+    if hasattr(posts, 'select_related'):
+        posts = posts.select_related('author', 'group').iterator()
+    get_backend().index(_documents(posts))
+
+
+def remove_posts(post_ids):
+    get_backend().remove(post_ids)
+
+
+def _index_batches(backend, posts):
+    posts = posts.select_related('author', 'group').order_by('id')
+    batch = []
+    total = 0
+    for post in posts.iterator(chunk_size=BATCH_SIZE):
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            backend.index(_documents(batch))
+            total += len(batch)
+            batch = []
+    backend.index(_documents(batch))
+    return total + len(batch)
+
+
+def reindex(posts):
+    """Переиндексирует queryset постов порциями; возвращает их число."""
+    return _index_batches(get_backend(), posts)
+
+
+def rebuild():
+    """Строит индекс заново; возвращает число проиндексированных постов."""
+    backend = get_backend()
+    backend.clear()
+    return _index_batches(backend, Post.objects.all())
+
+
+def search(query, queryset=None):
+    """Посты, подходящие под все слова запроса, с аннотацией ``rank``."""
+    if queryset is None:
+        queryset = Post.objects.feed()
+    terms = tokenize(query)[:MAX_TERMS]
+    if not terms:
+        return queryset.none()
+    return get_backend().search(queryset, terms)
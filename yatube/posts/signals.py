@@ -0,0 +1,285 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import caching, counters, search, tasks, timeline
+from .models import Comment, Follow, Group, Post, Profile
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def bump_post_version(sender, instance, raw=False, **kwargs):
+    """Новая версия поста вытесняет его карточку из кэша."""
+    if instance.pk and not raw:
+        instance.version += 1
+
+
+# Поля группы, которые видны на страницах: карточки и страница поста
+# показывают название и адрес, страница группы — ещё и описание.
+GROUP_CARD_FIELDS = ('title', 'slug')
+GROUP_PAGE_FIELDS = GROUP_CARD_FIELDS + ('description',)
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_fields(sender, instance, raw=False, **kwargs):
+    instance._previous_fields = None
+    if instance.pk and not raw:
+        instance._previous_fields = Group.objects.filter(
+            pk=instance.pk
+        ).values_list(*GROUP_PAGE_FIELDS).first()
+
+
+def _group_changes(instance):
+    """Прежние значения видимых полей группы, если они изменились."""
+    previous = getattr(instance, '_previous_fields', None)
+    current = tuple(getattr(instance, field) for field in GROUP_PAGE_FIELDS)
+    if previous and previous != current:
+        return dict(zip(GROUP_PAGE_FIELDS, previous))
+    return None
+
+
+@receiver(post_save, sender=Group)
+def bump_group_posts_version(sender, instance, created, raw=False,
+                             **kwargs):
+    previous = _group_changes(instance)
+    if previous and any(
+        previous[field] != getattr(instance, field)
+        for field in GROUP_CARD_FIELDS
+    ):
+        Post.objects.filter(group=instance).update(
+            version=F('version') + 1, modified=timezone.now()
+        )
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_profile(instance.author_id, posts_count=1)
+        counters.change_group(instance.group_id, posts_count=1)
+        return
+    previous = getattr(instance, '_previous_group_id', instance.group_id)
+    if previous != instance.group_id:
+        comments = instance.comments.count()
+        counters.change_group(
+            previous, posts_count=-1, comments_count=-comments
+        )
+        counters.change_group(
+            instance.group_id, posts_count=1, comments_count=comments
+        )
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, posts_count=-1)
+    counters.change_group(instance.group_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_profile(instance.author_id, comments_count=1)
+        counters.change_group(instance.post.group_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, comments_count=-1)
+    group_id = Post.objects.filter(id=instance.post_id).values_list(
+        'group_id', flat=True
+    ).first()
+    counters.change_group(group_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        tasks.fan_out.enqueue(instance.id)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_profile(instance.author_id, followers_count=1)
+        counters.change_profile(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, followers_count=-1)
+    counters.change_profile(instance.user_id, following_count=-1)
+
+
+def _switch_fanout_mode(author_id, followed):
+    if timeline.crossed_limit(author_id, followed):
+        tasks.switch_fanout_mode.enqueue(
+            author_id, dedupe_key=f'switch_fanout_mode:{author_id}'
+        )
+
+
+@receiver(post_save, sender=Follow)
+def follow_crosses_fanout_limit(sender, instance, created, raw=False,
+                                **kwargs):
+    if created and not raw:
+        _switch_fanout_mode(instance.author_id, followed=True)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_crosses_fanout_limit(sender, instance, **kwargs):
+    _switch_fanout_mode(instance.author_id, followed=False)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        tasks.backfill.enqueue(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user, instance.author)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.invalidate_post(
+            instance, getattr(instance, '_previous_group_id', None)
+        )
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_feeds(sender, instance, raw=False, **kwargs):
+    previous = _group_changes(instance)
+    if not raw and previous:
+        caching.invalidate_group(instance, previous['slug'])
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group_feeds(sender, instance, **kwargs):
+    caching.invalidate_group(instance)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.invalidate_comment(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.invalidate_follow(instance)
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnail(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tasks.schedule_thumbnails(instance.image)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tasks.index_posts.enqueue(
+            [instance.id], dedupe_key=f'index_post:{instance.id}'
+        )
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_posts([instance.id])
+
+
+@receiver(post_save, sender=Group)
+def reindex_group_posts(sender, instance, raw=False, **kwargs):
+    previous = _group_changes(instance)
+    if not raw and previous and previous['title'] != instance.title:
+        tasks.index_group_posts.enqueue(
+            instance.id, dedupe_key=f'index_group_posts:{instance.id}'
+        )
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    instance._post_ids = list(instance.posts.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def reindex_ungrouped_posts(sender, instance, **kwargs):
+    if instance._post_ids:
+        tasks.index_posts.enqueue(instance._post_ids)
+
+
+USER_NAME_FIELDS = ('first_name', 'last_name', 'username')
+
+
+def _changes_names(update_fields):
+    return update_fields is None or any(
+        field in update_fields for field in USER_NAME_FIELDS
+    )
+
+
+@receiver(pre_save, sender=User)
+def remember_user_names(sender, instance, raw=False, update_fields=None,
+                        **kwargs):
+    instance._previous_names = None
+    if instance.pk and not raw and _changes_names(update_fields):
+        instance._previous_names = User.objects.filter(
+            pk=instance.pk
+        ).values_list(*USER_NAME_FIELDS).first()
+
+
+def _previous_names(instance):
+    """Прежние имя, фамилия и username, если пользователь переименован."""
+    previous = getattr(instance, '_previous_names', None)
+    names = tuple(getattr(instance, field) for field in USER_NAME_FIELDS)
+    if previous and previous != names:
+        return dict(zip(USER_NAME_FIELDS, previous))
+    return None
+
+
+@receiver(post_save, sender=User)
+def reindex_user_posts(sender, instance, raw=False, **kwargs):
+    if not raw and _previous_names(instance):
+        tasks.index_author_posts.enqueue(
+            instance.id, dedupe_key=f'index_author_posts:{instance.id}'
+        )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_feeds(sender, instance, raw=False, **kwargs):
+    """Имя автора показано в профиле, лентах и на страницах его постов."""
+    previous = _previous_names(instance)
+    if raw or not previous:
+        return
+    # Новая версия вытесняет карточки с прежним именем, новая дата
+    # правки сдвигает Last-Modified профиля и страниц постов.
+    Post.objects.filter(author=instance).update(
+        version=F('version') + 1, modified=timezone.now()
+    )
+    caching.invalidate_author(instance, previous['username'])
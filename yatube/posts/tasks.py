@@ -0,0 +1,60 @@
+"""Отложенные последствия записей: выполняются воркером ``run_tasks``.
+
+Запрос, создавший пост, только ставит задачи (по вставке строки на
+каждую), а раскладка по лентам подписчиков, индексация и миниатюры
+выполняются вне него.
+"""
+from core.tasks import task
+
+from . import search, thumbnails, timeline
+from .models import Follow, Post
+
+
+@task()
+def fan_out(post_id):
+    post = Post.objects.select_related('author').filter(id=post_id).first()
+    if post is not None:
+        timeline.fan_out(post)
+
+
+@task()
+def backfill(user_id, author_id):
+    # Подписку могли отменить, пока задача ждала.
+    follow = Follow.objects.select_related('user', 'author').filter(
+        user_id=user_id, author_id=author_id
+    ).first()
+    if follow is not None:
+        timeline.backfill(follow.user, follow.author)
+
+
+@task()
+def switch_fanout_mode(author_id):
+    timeline.switch_mode(author_id)
+
+
+@task()
+def index_posts(post_ids):
+    search.index_posts(Post.objects.filter(id__in=post_ids))
+
+
+@task()
+def index_group_posts(group_id):
+    search.index_posts(Post.objects.filter(group_id=group_id))
+
+
+@task()
+def index_author_posts(user_id):
+    search.index_posts(Post.objects.filter(author_id=user_id))
+
+
+@task(max_attempts=3)
+def generate_thumbnails(name):
+    thumbnails.generate(name)
+
+
+def schedule_thumbnails(image):
+    """Ставит создание миниатюр картинки в очередь."""
+    if image:
+        generate_thumbnails.enqueue(
+            image.name, dedupe_key=f'thumbnails:{image.name}'
+        )
@@ -0,0 +1,24 @@
+from django import template
+
+from posts import thumbnails
+
+
+register = template.Library()
+
+# Карточка занимает всю ширину колонки, но не больше 960px.
+CARD_SIZES = '(max-width: 992px) 100vw, 960px'
+
+
+@register.inclusion_tag('posts/includes/post_picture.html')
+def post_picture(image):
+    """Разметка ``<picture>`` с вариантами картинки или заглушка.
+
+    Варианты ставит в очередь сохранение поста, а не рендер: GET не
+    пишет в базу.
+    """
+    return {
+        'picture': thumbnails.picture(image),
+        'sizes': CARD_SIZES,
+        'width': thumbnails.CARD_WIDTH,
+        'height': thumbnails.CARD_HEIGHT,
+    }
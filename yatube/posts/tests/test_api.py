@@ -0,0 +1,88 @@
+from http import HTTPStatus
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.tasks import run_pending
+from ..models import Comment, Follow, Group, Post, User
+from ..views import DISPLAYED_COUNT
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for number in range(DISPLAYED_COUNT + 3):
+            cls.post = Post.objects.create(
+                text=f'Пост #{number}', author=cls.author, group=cls.group
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        run_pending()
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_feeds_paginated_json(self):
+        """Ленты отдаются компактным JSON с курсором на следующую страницу."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.author.username]),
+            reverse('posts:api_follow_index'),
+        ]
+        self.client.force_login(self.reader)
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), DISPLAYED_COUNT)
+                self.assertEqual(data['results'][0]['id'], self.post.id)
+                self.assertIsNone(data['previous'])
+                data = self.client.get(data['next']).json()
+                self.assertEqual(len(data['results']), 3)
+                self.assertIsNone(data['next'])
+
+    def test_follow_requires_login(self):
+        """Лента подписок без входа — 401, с входом — посты авторов."""
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.UNAUTHORIZED
+        )
+        self.client.force_login(self.reader)
+        data = self.client.get(url).json()
+        self.assertEqual(data['results'][0]['author'], self.author.username)
+
+    def test_etag_not_modified(self):
+        """Неизменная лента отвечает 304, правка поста меняет ETag."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_detail_with_comments(self):
+        """Пост отдаётся с комментариями; новый комментарий меняет ETag."""
+        url = reverse('posts:api_post_detail', args=[self.post.id])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['comments'], [])
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['comments'][0]['text'], 'Да')
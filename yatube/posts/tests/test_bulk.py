@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.cache import get_generations
+
+from .. import caching, search
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class BulkCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание'
+        )
+        self.post = Post.objects.create(
+            text='Старый пост про лошадь', author=self.author,
+            group=self.group,
+        )
+        Post.objects.filter(id=self.post.id).update(
+            pub_date=datetime(2020, 1, 2, tzinfo=timezone.utc)
+        )
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_export_import_round_trip(self):
+        """Выгруженные данные загружаются обратно с датами и связями."""
+        files = {
+            'posts': self.path('posts.ndjson'),
+            'comments': self.path('comments.csv'),
+            'follows': self.path('follows.ndjson'),
+        }
+        for kind, path in files.items():
+            call_command(
+                'bulk_export', kind, output=path, stderr=StringIO()
+            )
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        User.objects.filter(username='reader').delete()
+
+        out = StringIO()
+        for kind, path in files.items():
+            call_command(
+                'bulk_import', kind, path, batch_size=1, stdout=out
+            )
+        self.assertIn('posts: 1 строк', out.getvalue())
+        post = Post.objects.get(id=self.post.id)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.group, self.group)
+        reader = User.objects.get(username='reader')
+        self.assertFalse(reader.has_usable_password())
+        self.assertEqual(post.comments.get().author, reader)
+        self.assertEqual(reader.profile.comments_count, 1)
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.followers_count, 1)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=reader, post=post).exists()
+        )
+        self.assertEqual(
+            list(search.search('лошадь').values_list('id', flat=True)),
+            [post.id],
+        )
+
+    def test_import_touches_only_its_authors(self):
+        """Импорт дополняет ленты своих авторов и не чистит весь кэш."""
+        path = self.path('new.ndjson')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write('{"text": "Новый пост", "author": "author"}\n')
+        cache.set('unrelated', 'kept')
+        profile = caching.profile_feed(self.author.username)
+        other = caching.profile_feed('nobody')
+        before = get_generations(profile, other)
+        with mock.patch('posts.timeline.rebuild') as rebuild, \
+                mock.patch('posts.counters.rebuild') as rebuild_counters, \
+                mock.patch('posts.search.rebuild') as rebuild_search:
+            call_command('bulk_import', 'posts', path, stdout=StringIO())
+        rebuild.assert_not_called()
+        rebuild_counters.assert_not_called()
+        rebuild_search.assert_not_called()
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 2)
+        self.assertEqual(
+            list(search.search('новый').values_list('text', flat=True)),
+            ['Новый пост'],
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post__text='Новый пост'
+        ).exists())
+        self.assertEqual(cache.get('unrelated'), 'kept')
+        after = get_generations(profile, other)
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+
+    def test_unknown_group_stops_import(self):
+        """Ссылка на несуществующую группу останавливает импорт."""
+        path = self.path('bad.ndjson')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                '{"text": "Пост", "author": "author", "group": "nope"}\n'
+            )
+        with self.assertRaisesMessage(CommandError, 'nope'):
+            call_command('bulk_import', 'posts', path, stdout=StringIO())
+
+    def test_failed_import_keeps_committed_chunks_consistent(self):
+        """Порции до ошибки пересчитаны, битая строка — CommandError."""
+        path = self.path('partial.ndjson')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write('{"text": "Первая лошадь", "author": "author"}\n')
+            stream.write('{"text": "Вторая", "author": "author"\n')
+        with self.assertRaisesMessage(CommandError, 'после 1 строк'):
+            call_command(
+                'bulk_import', 'posts', path, batch_size=1, stdout=StringIO()
+            )
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 2)
+        self.assertIn(
+            'Первая лошадь',
+            search.search('лошадь').values_list('text', flat=True),
+        )
@@ -0,0 +1,108 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, Profile, User
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='simple_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+
+    def assertCounters(self, obj, **expected):
+        obj.refresh_from_db()
+        for field, value in expected.items():
+            with self.subTest(obj=obj, field=field):
+                self.assertEqual(getattr(obj, field), value)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        self.author_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост', 'group': self.group.id},
+        )
+        post = Post.objects.get()
+        self.user_client.post(
+            reverse('posts:add_comment', args=[post.id]), {'text': 'Ура'}
+        )
+        self.user_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertCounters(
+            self.author.profile, posts_count=1, followers_count=1
+        )
+        self.assertCounters(
+            self.user.profile, comments_count=1, following_count=1
+        )
+        self.assertCounters(self.group, posts_count=1, comments_count=1)
+
+        self.author_client.post(
+            reverse('posts:post_edit', args=[post.id]),
+            {'text': 'Пост', 'group': self.other_group.id},
+        )
+        self.assertCounters(self.group, posts_count=0, comments_count=0)
+        self.assertCounters(self.other_group, posts_count=1, comments_count=1)
+
+        self.user_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        Post.objects.get(id=post.id).delete()
+        self.assertCounters(
+            self.author.profile, posts_count=0, followers_count=0
+        )
+        self.assertCounters(
+            self.user.profile, comments_count=0, following_count=0
+        )
+        self.assertCounters(self.other_group, posts_count=0, comments_count=0)
+
+    def test_profile_and_detail_do_not_count(self):
+        """Страницы берут число постов из профиля, а не из COUNT."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Profile.objects.filter(user=self.author).update(posts_count=42)
+        for url in (
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[post.id]),
+        ):
+            with self.subTest(url=url):
+                response = self.user_client.get(url)
+                self.assertEqual(response.context['posts_count'], 42)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+        Comment.objects.create(post=post, author=self.user, text='Ура')
+        Profile.objects.update(posts_count=7, comments_count=7)
+        Group.objects.update(posts_count=7, comments_count=7)
+        Profile.objects.filter(user=self.user).delete()
+
+        call_command('rebuild_counters', stdout=StringIO())
+
+        self.assertCounters(self.author.profile, posts_count=1)
+        self.assertCounters(
+            Profile.objects.get(user=self.user), comments_count=1
+        )
+        self.assertCounters(self.group, posts_count=1, comments_count=1)
+        self.assertCounters(self.other_group, posts_count=0)
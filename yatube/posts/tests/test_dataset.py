@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, Profile, User
+
+
+class DatasetBenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        call_command(
+            'generate_dataset', users=40, posts=300, groups=6,
+            comments=60, follows_per_user=5, stdout=StringIO(),
+        )
+
+    def test_generate_dataset(self):
+        """Набор данных перекошен, счётчики и профили заполнены."""
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Profile.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 60)
+        self.assertTrue(Follow.objects.exists())
+        groups = list(
+            Group.objects.order_by('-posts_count')
+            .values_list('posts_count', flat=True)
+        )
+        self.assertEqual(len(groups), 6)
+        self.assertGreater(groups[0], 2 * groups[-1])
+        self.assertEqual(
+            sum(Profile.objects.values_list('posts_count', flat=True)), 300
+        )
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', users=1, stdout=StringIO())
+
+    def test_bench_views_baseline(self):
+        """Замер сохраняет базовую линию и ловит рост числа запросов."""
+        path = os.path.join(self.directory, 'views.json')
+        options = {'repeat': 2, 'warmup': 0, 'baseline': path}
+        call_command('bench_views', save=True, stdout=StringIO(), **options)
+        with open(path, encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        self.assertEqual(
+            set(baseline['views']),
+            {'index', 'group_posts', 'profile', 'post_detail',
+             'follow_index'},
+        )
+        self.assertEqual(baseline['meta']['posts'], 300)
+
+        for metrics in baseline['views'].values():
+            metrics['p50_ms'] = metrics['p99_ms'] = 10 ** 6
+        baseline['views']['index']['queries'] = 0
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump(baseline, stream)
+        with self.assertRaisesMessage(CommandError, 'index: запросов 0'):
+            call_command('bench_views', stdout=StringIO(), **options)
+
+    def test_bench_templates_baseline(self):
+        """Замер шаблонов сохраняет базовую линию и ловит регрессии."""
+        path = os.path.join(self.directory, 'templates.json')
+        options = {'repeat': 2, 'warmup': 0, 'baseline': path}
+        call_command(
+            'bench_templates', save=True, stdout=StringIO(), **options
+        )
+        with open(path, encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        self.assertIn('posts/index.html', baseline['templates'])
+        self.assertIn('posts/post_detail.html', baseline['templates'])
+
+        for metrics in baseline['templates'].values():
+            metrics['p50_ms'] = metrics['p99_ms'] = 10 ** 6
+        baseline['templates']['posts/index.html']['p50_ms'] = 0
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump(baseline, stream)
+        with self.assertRaisesMessage(
+            CommandError, 'posts/index.html: p50_ms 0'
+        ):
+            call_command('bench_templates', stdout=StringIO(), **options)
@@ -0,0 +1,131 @@
+import json
+from http import HTTPStatus
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.cache import get_generations, make_etag
+from .. import caching
+from ..feeds import FEED_SIZE
+from ..models import Group, Post, User
+
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for number in range(FEED_SIZE + 2):
+            cls.post = Post.objects.create(
+                text=f'Пост #{number} <и разметка>',
+                author=cls.author,
+                group=cls.group,
+            )
+        Post.objects.create(
+            text='Чужой пост',
+            author=User.objects.create_user(username='other'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def content(self, url):
+        # getvalue() собирает и потоковый ответ.
+        return self.client.get(url).getvalue()
+
+    def test_formats(self):
+        """RSS, Atom и JSON Feed разбираются и содержат последние посты."""
+        url = reverse('posts:group_feed', args=[self.group.slug, 'rss'])
+        channel = ElementTree.fromstring(self.content(url)).find('channel')
+        self.assertEqual(channel.find('title').text, self.group.title)
+        items = channel.findall('item')
+        self.assertEqual(len(items), FEED_SIZE)
+        self.assertEqual(items[0].find('description').text, self.post.text)
+
+        url = reverse(
+            'posts:profile_feed', args=[self.author.username, 'atom']
+        )
+        feed = ElementTree.fromstring(self.content(url))
+        entries = feed.findall(f'{ATOM}entry')
+        self.assertEqual(len(entries), FEED_SIZE)
+        self.assertEqual(
+            entries[0].find(f'{ATOM}author/{ATOM}name').text, 'Лев Толстой'
+        )
+
+        data = json.loads(self.content(reverse('posts:feed', args=['json'])))
+        self.assertEqual(len(data['items']), FEED_SIZE)
+        self.assertEqual(data['items'][0]['content_text'], 'Чужой пост')
+        self.assertEqual(data['items'][1]['tags'], [self.group.title])
+
+    def test_unknown_feed(self):
+        """Неизвестный формат или группа — 404."""
+        urls = [
+            reverse('posts:feed', args=['yaml']),
+            reverse('posts:group_feed', args=['missing', 'rss']),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+                )
+
+    def test_missing_feed_not_modified_is_404(self):
+        """ETag несуществующей ленты не даёт 304 вместо 404."""
+        feeds = [
+            ('group_feed', caching.group_feed('missing')),
+            ('profile_feed', caching.profile_feed('missing')),
+        ]
+        for name, generation in feeds:
+            with self.subTest(name=name):
+                etag = make_etag(
+                    get_generations(generation), 'rss', 'testserver'
+                )
+                response = self.client.get(
+                    reverse(f'posts:{name}', args=['missing', 'rss']),
+                    HTTP_IF_NONE_MATCH=etag,
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_streamed_then_cached(self):
+        """Первый ответ собирается потоком, следующие — из кэша."""
+        url = reverse('posts:feed', args=['rss'])
+        first = self.client.get(url)
+        self.assertTrue(first.streaming)
+        first = first.getvalue()
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertFalse(second.streaming)
+        self.assertEqual(second.content, first)
+
+    def test_not_modified(self):
+        """Опрос неизменной ленты получает 304 без запросов к базе."""
+        url = reverse('posts:feed', args=['atom'])
+        response = self.client.get(url)
+        response.getvalue()
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=last_modified
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('Новый пост', response.getvalue().decode())
+        self.assertNotEqual(response['ETag'], etag)
@@ -61,6 +61,7 @@ class PostsCreateFormTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        self.uploaded.seek(0)
         self.guest_user = Client()
         self.authorized_client_not_author = Client()
         self.authorized_client_not_author.force_login(self.user)
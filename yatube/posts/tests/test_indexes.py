@@ -0,0 +1,56 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from ..management.commands.audit_indexes import FULL_SCAN
+from ..models import Follow, User
+
+
+class IndexesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='simple_user')
+        cls.author = User.objects.create_user(username='author')
+
+    def test_follow_constraints(self):
+        """Нельзя подписаться дважды или на самого себя."""
+        Follow.objects.create(user=self.user, author=self.author)
+        for user, author in (
+            (self.user, self.author),
+            (self.user, self.user),
+        ):
+            with self.subTest(user=user, author=author):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.create(user=user, author=author)
+
+    def test_audit_indexes_passes(self):
+        """Запросы лент не читают таблицы целиком."""
+        out = StringIO()
+        call_command('audit_indexes', stdout=out)
+        self.assertIn('post_pub_date_idx', out.getvalue())
+
+    def test_full_scan_detection(self):
+        """Полный просмотр таблицы распознаётся в плане запроса."""
+        plans = {
+            '2 0 0 SCAN posts_post': True,
+            '2 0 0 SCAN TABLE posts_post': True,
+            'Seq Scan on posts_post  (cost=0.00..1.01)': True,
+            '2 0 0 SCAN posts_post USING INDEX post_pub_date_idx': False,
+            '2 0 0 SCAN posts_post USING COVERING INDEX x': False,
+            '2 0 0 SCAN TABLE posts_post USING INDEX post_pub_date_idx':
+                False,
+            '2 0 0 SCAN TABLE posts_post USING COVERING INDEX x': False,
+            '2 0 0 SCAN posts_search VIRTUAL TABLE INDEX 0:M1': False,
+            '2 0 0 SCAN TABLE posts_search VIRTUAL TABLE INDEX 0:M1': False,
+            '2 0 0 SCAN CONSTANT ROW': False,
+            '2 0 0 SEARCH posts_post USING INDEX x (author_id=?)': False,
+            '2 0 0 SEARCH TABLE posts_post USING INDEX x (author_id=?)':
+                False,
+        }
+        for plan, expected in plans.items():
+            with self.subTest(plan=plan):
+                self.assertEqual(bool(FULL_SCAN.search(plan)), expected)
@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import timedelta
+
+from django.db.models import FloatField, Value
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Post, User
+from ..paginators import CursorPaginator
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        for i in range(25):
+            Post.objects.create(text=f'Пост #{i}', author=cls.user)
+        # Одинаковая дата у части постов: порядок решает id.
+        Post.objects.filter(id__lte=Post.objects.order_by('id')[4].id).update(
+            pub_date=timezone.now() - timedelta(days=1)
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def setUp(self):
+        self.paginator = CursorPaginator(Post.objects.all(), 10)
+
+    def test_walk_forward_and_back(self):
+        """Проход вперёд и назад по курсорам без пропусков и повторов."""
+        pages = [self.paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(self.paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        seen = [post.id for page in pages for post in page]
+        self.assertEqual(seen, self.expected)
+
+        back = self.paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(
+            [post.id for post in back], [post.id for post in pages[1]]
+        )
+        first = self.paginator.get_page(back.previous_cursor)
+        self.assertFalse(first.has_previous())
+        self.assertEqual(
+            [post.id for post in first], [post.id for post in pages[0]]
+        )
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Битый курсор отдаёт первую страницу."""
+        for cursor in ('garbage', 'W10', '!!!', ''):
+            with self.subTest(cursor=cursor):
+                page = self.paginator.get_page(cursor)
+                self.assertEqual(page[0].id, self.expected[0])
+
+    def test_crafted_cursor_returns_first_page(self):
+        """Курсор со значениями не тех типов отдаёт первую страницу."""
+        def token(values):
+            payload = json.dumps([values, 0]).encode()
+            return base64.urlsafe_b64encode(payload).decode()
+
+        ranked = CursorPaginator(
+            Post.objects.annotate(rank=Value(1.0, FloatField())), 10,
+            ('-rank', '-pub_date', '-id'),
+        )
+        cursors = [
+            (self.paginator, [123, 1]),
+            (self.paginator, [{'date': 1}, 1]),
+            (self.paginator, [['2020-01-01'], 1]),
+            (self.paginator, [timezone.now().isoformat(), [1]]),
+            (self.paginator, [timezone.now().isoformat(), None]),
+            (ranked, ['1', timezone.now().isoformat(), 1]),
+            (ranked, [None, timezone.now().isoformat(), 1]),
+            (ranked, [{'rank': 1}, timezone.now().isoformat(), 1]),
+        ]
+        for paginator, values in cursors:
+            with self.subTest(values=values):
+                page = paginator.get_page(token(values))
+                self.assertEqual(len(page), 10)
+                self.assertFalse(page.has_previous())
+
+    def test_page_does_not_count(self):
+        """Получение страницы не выполняет COUNT."""
+        page = self.paginator.get_page(None)
+        with self.assertNumQueries(0):
+            page.has_other_pages()
+        with self.assertNumQueries(1):
+            list(self.paginator.get_page(page.next_cursor))
@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from .utils import QueryCountMixin
+
+
+# Два запроса на сессию и пользователя, один на Last-Modified,
+# остальные — данные страницы.
+MAX_QUERIES = {
+    'posts:index': 4,
+    'posts:group_list': 5,
+    'posts:profile': 6,
+    'posts:post_detail': 5,
+    'posts:follow_index': 4,
+}
+
+
+class FeedQueriesTest(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{number}', first_name=f'Автор {number}'
+            )
+            for number in range(5)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(
+                text=f'Пост {author}', author=author, group=cls.group
+            )
+            Comment.objects.create(post=post, author=author, text='Ответ')
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def urls(self):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', args=[self.group.slug]
+            ),
+            'posts:profile': reverse(
+                'posts:profile', args=[self.post.author.username]
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', args=[self.post.id]
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def assert_views_queries(self):
+        for name, url in self.urls().items():
+            with self.subTest(view=name):
+                cache.clear()
+                with self.assertMaxQueries(MAX_QUERIES[name]):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_views_query_count(self):
+        """Число запросов страниц ограничено и не растёт с числом постов."""
+        self.assert_views_queries()
+        for number in range(5, 10):
+            author = User.objects.create_user(username=f'author{number}')
+            Follow.objects.create(user=self.reader, author=author)
+            Post.objects.create(
+                text='Ещё пост', author=author, group=self.group
+            )
+            Comment.objects.create(
+                post=self.post, author=author, text='Ещё ответ'
+            )
+        self.assert_views_queries()
@@ -0,0 +1,117 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post, SearchTerm, User
+
+
+class SearchTestMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Ёжики', slug='hedgehogs', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Ёжик в тумане искал лошадь', author=cls.author
+        )
+        cls.other = Post.objects.create(
+            text='Лошадь, лошадь и ещё раз лошадь',
+            author=User.objects.create_user(username='other'),
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, query):
+        return list(search.search(query).values_list('id', flat=True))
+
+    def test_finds_text_group_and_author(self):
+        """Поиск идёт по тексту, названию группы и имени автора."""
+        self.assertEqual(self.found('ежик тумане'), [self.post.id])
+        self.assertEqual(self.found('ЁЖИКИ'), [self.other.id])
+        self.assertEqual(self.found('толстой'), [self.post.id])
+        self.assertEqual(self.found('ежик слон'), [])
+        self.assertEqual(self.found('!!!'), [])
+
+    def test_ranked_by_relevance(self):
+        """Пост, где слово встречается чаще, выше в выдаче."""
+        found = search.search('лошадь').order_by(*search.ORDERING)
+        self.assertEqual(
+            list(found.values_list('id', flat=True)),
+            [self.other.id, self.post.id],
+        )
+
+    def test_index_follows_writes(self):
+        """Индекс обновляется при изменении поста, группы и автора."""
+        self.post.text = 'Совсем другой текст'
+        self.post.save()
+        self.assertEqual(self.found('тумане'), [])
+        self.assertEqual(self.found('другой'), [self.post.id])
+
+        self.group.title = 'Кактусы'
+        self.group.save()
+        self.assertEqual(self.found('кактусы'), [self.other.id])
+
+        self.author.last_name = 'Николаевич'
+        self.author.save()
+        self.assertEqual(self.found('николаевич'), [self.post.id])
+
+        self.group.delete()
+        self.assertEqual(self.found('кактусы'), [])
+        Post.objects.get(id=self.post.id).delete()
+        self.assertEqual(self.found('другой'), [])
+
+    def test_search_view_pages(self):
+        """Страница поиска листается курсором, не теряя запрос."""
+        for number in range(12):
+            Post.objects.create(text=f'Лошадь #{number}', author=self.author)
+        url = reverse('posts:search')
+        page = self.client.get(url, {'q': 'лошадь'}).context['page_obj']
+        self.assertEqual(len(page), 10)
+        response = self.client.get(
+            url, {'q': 'лошадь', 'cursor': page.next_cursor}
+        )
+        self.assertEqual(len(response.context['page_obj']), 4)
+        self.assertContains(response, 'q=%D0%BB%D0%BE%D1%88%D0%B0%D0%B4%D1%8C')
+
+    def test_rebuild_command(self):
+        """Команда восстанавливает индекс с нуля."""
+        search.get_backend().clear()
+        self.assertEqual(self.found('тумане'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('постов: 2', out.getvalue())
+        self.assertEqual(self.found('тумане'), [self.post.id])
+
+
+@override_settings(SEARCH_BACKEND='fts5', TASKS_EAGER=True)
+class FTS5SearchTest(SearchTestMixin, TestCase):
+    def test_bench_command(self):
+        """Бенчмарк листает выдачу search() на моделях базы."""
+        out = StringIO()
+        call_command('bench_search', repeat=1, stdout=out)
+        self.assertIn('частое   fts5', out.getvalue())
+        self.assertIn('частое   like', out.getvalue())
+
+
+@override_settings(SEARCH_BACKEND='terms', TASKS_EAGER=True)
+class TermsSearchTest(SearchTestMixin, TestCase):
+    def test_terms_stored(self):
+        """Обратный индекс хранит термы поста."""
+        self.assertTrue(
+            SearchTerm.objects.filter(post=self.post, term='ежик').exists()
+        )
+
+    def test_document_count_cached(self):
+        """Число постов для idf не считается на каждый поиск."""
+        self.found('лошадь')
+        with self.assertNumQueries(2):
+            self.found('лошадь')
@@ -0,0 +1,90 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import Task
+from .. import thumbnails
+from ..models import Post, User
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='small.gif', content=small_gif, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = reverse('posts:profile', args=[self.user.username])
+
+    def test_placeholder_until_thumbnail_exists(self):
+        """Пока миниатюры нет, карточка показывает заглушку."""
+        # Миниатюры поставило в очередь сохранение поста, рендер не пишет.
+        self.assertTrue(Task.objects.filter(
+            dedupe_key=f'thumbnails:{self.post.image.name}'
+        ).exists())
+        with mock.patch('posts.tasks.schedule_thumbnails') as schedule:
+            response = self.client.get(self.url)
+        schedule.assert_not_called()
+        self.assertContains(response, 'bg-light')
+        self.assertNotContains(response, '<img class="card-img')
+
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        self.assertFalse(thumbnails.generate(self.post.image.name))
+        response = self.client.get(self.url)
+        self.assertContains(response, '<img class="card-img')
+        self.assertEqual(
+            Post.objects.get(id=self.post.id).version, self.post.version + 1
+        )
+
+    def test_generate_thumbnails_command(self):
+        """Команда создаёт недостающие миниатюры."""
+        out = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=out)
+        self.assertIn('создано миниатюр: 1', out.getvalue())
+        self.assertIsNotNone(thumbnails.card_thumbnail(self.post.image))
+
+    def test_picture_sources(self):
+        """После генерации карточка отдаёт <picture> с WebP и srcset."""
+        thumbnails.generate(self.post.image.name)
+        response = self.client.get(self.url)
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        picture = thumbnails.picture(self.post.image)
+        self.assertRegex(picture['srcset'], r'\.jpg \d+w')
+        for source in picture['sources']:
+            self.assertNotIn('.jpg', source['srcset'])
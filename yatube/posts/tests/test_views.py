@@ -1,14 +1,19 @@
 import shutil
 import tempfile
+from datetime import timedelta
+from unittest import mock
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django import forms
 
-from ..models import Group, Post, User
+from core.tasks import run_pending
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+from ..views import COMMENTS_COUNT, DISPLAYED_COUNT
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -127,23 +132,82 @@ class PostsTestViews(TestCase):
 
     @override_settings(CACHES=TEMP_CACHES)
     def test_index_page_cache(self):
-        """Шаблон index.html кэшируется
-         и принудительно очищается.
-         """
+        """Шаблон index.html кэшируется до изменения постов
+        и принудительно очищается.
+        """
+        index_url = reverse('posts:index')
         post = Post.objects.create(
             text='Тестируем кэширование',
             author=self.user_author,
         )
-        add_in_cache = self.authorized_client.get(
-            reverse('posts:index')).content
-        post.delete()
-        check_cache = self.authorized_client.get(
-            reverse('posts:index')).content
-        self.assertEqual(add_in_cache, check_cache)
+        self.assertContains(
+            self.authorized_client.get(index_url), post.text
+        )
+        Post.objects.filter(id=post.id).update(text='Изменено в обход')
+        self.assertContains(
+            self.authorized_client.get(index_url), post.text
+        )
         cache.clear()
-        empty_cache = self.authorized_client.get(
-            reverse('posts:index')).content
-        self.assertNotEqual(empty_cache, check_cache)
+        self.assertContains(
+            self.authorized_client.get(index_url), 'Изменено в обход'
+        )
+        post.delete()
+        self.assertNotContains(
+            self.authorized_client.get(index_url), 'Изменено в обход'
+        )
+
+    def test_feed_cache_invalidated_per_feed(self):
+        """Новый пост сбрасывает только затронутые ленты."""
+        other_group = Group.objects.create(
+            title='Другая группа', slug='other_slug', description='-'
+        )
+        urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'other_group': reverse(
+                'posts:group_list', args=[other_group.slug]
+            ),
+            'profile': reverse('posts:profile', args=[self.user_author]),
+            'other_profile': reverse('posts:profile', args=[self.user]),
+        }
+        for url in urls.values():
+            self.guest_client.get(url)
+        Post.objects.create(
+            text='Новый пост', author=self.user_author, group=self.group
+        )
+        for name, url in urls.items():
+            with self.subTest(feed=name):
+                response = self.guest_client.get(url)
+                if name.startswith('other'):
+                    self.assertIsNone(response.context)
+                else:
+                    self.assertContains(response, 'Новый пост')
+
+    def test_post_card_cached_until_new_version(self):
+        """Карточка поста берётся из кэша, пока не сменится версия."""
+        url = reverse('posts:profile', kwargs={'username': self.user_author})
+        self.guest_client.get(url)
+        Post.objects.filter(id=self.post.id).update(text='Текст в обход')
+        self.assertNotContains(self.guest_client.get(url), 'Текст в обход')
+
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый текст', 'group': self.group.id},
+        )
+        self.assertContains(self.guest_client.get(url), 'Новый текст')
+
+        group = Group.objects.get(id=self.group.id)
+        group.slug = 'renamed_slug'
+        group.save()
+        self.assertContains(self.guest_client.get(url), 'renamed_slug')
+
+        index = reverse('posts:index')
+        self.guest_client.get(index)
+        author = User.objects.get(id=self.user_author.id)
+        author.first_name = 'Лев'
+        author.last_name = 'Толстой'
+        author.save()
+        self.assertContains(self.guest_client.get(index), 'Автор: Лев Толстой')
 
     def test_group_page_show_correct_context(self):
         """Шаблон group_list.html сформирован с правильным контекстом."""
@@ -165,6 +229,26 @@ class PostsTestViews(TestCase):
         self.assertEqual(response_author.context['group'], self.group)
         self.subtest_for_posts(response_author.context['page_obj'][0])
 
+    def test_group_page_shows_only_group_posts(self):
+        """На странице группы нет постов других групп."""
+        other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Другое описание',
+        )
+        Post.objects.create(
+            text='Пост другой группы',
+            author=self.user_author,
+            group=other_group,
+        )
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        )
+        self.assertEqual(
+            [post.group for post in response.context['page_obj']],
+            [self.group],
+        )
+
     def test_profile_page_show_correct_context(self):
         """Шаблон profile.html сформирован с правильным контекстом."""
         response_not_author = self.authorized_client_but_not_author.get(
@@ -252,20 +336,345 @@ class PaginatorViewsTest(TestCase):
         first_page_count = 10
         second_page_count = 3
         pages = [
+            reverse('posts:index'),
             reverse('posts:group_list', kwargs={'slug': self.group.slug}),
             reverse('posts:profile', kwargs={'username': self.user.username}),
         ]
         for page in pages:
             with self.subTest(page=page):
+                cache.clear()
+                first_page = self.guest_client.get(page).context['page_obj']
+                self.assertEqual(len(first_page), first_page_count)
+                self.assertFalse(first_page.has_previous())
+                second_page = self.guest_client.get(
+                    page, {'cursor': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), second_page_count)
+                self.assertFalse(second_page.has_next())
                 self.assertEqual(
-                    len(self.guest_client.get(page).context.get('page_obj')),
-                    first_page_count,
+                    second_page[0].text,
+                    f'Пост #{second_page_count - 1}',
                 )
-                self.assertEqual(
-                    len(
-                        self.guest_client.get(page + '?page=2').context.get(
-                            'page_obj'
-                        )
+
+
+class FollowViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other_author = User.objects.create_user(username='other_author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки', author=cls.author
+        )
+        Post.objects.create(text='Чужой пост', author=cls.other_author)
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def get_feed(self):
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_follow_backfills_and_fans_out(self):
+        """Подписка дополняет ленту, новые посты попадают в неё."""
+        self.follower_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        # Дополнение и раскладка по лентам — задачи очереди.
+        self.assertEqual(self.get_feed(), [])
+        run_pending()
+        self.assertEqual(self.get_feed(), [self.old_post.text])
+        Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.get_feed(), [self.old_post.text])
+        run_pending()
+        self.assertEqual(self.get_feed(), ['Новый пост', self.old_post.text])
+
+    def test_feed_paginated_by_cursor(self):
+        """Курсор ленты подписок ведёт на вторую страницу."""
+        Post.objects.bulk_create(
+            Post(text=f'Пост #{number}', author=self.author)
+            for number in range(DISPLAYED_COUNT)
+        )
+        Follow.objects.create(user=self.follower, author=self.author)
+        run_pending()
+        url = reverse('posts:follow_index')
+        first = self.follower_client.get(url).context['page_obj']
+        self.assertTrue(first.has_next())
+        second = self.follower_client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual([post.text for post in second], [self.old_post.text])
+
+    def test_backfill_skipped_after_unfollow(self):
+        """Подписка, отменённая до выполнения задачи, ленту не дополняет."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.filter(user=self.follower).delete()
+        run_pending()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists()
+        )
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.follower_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists()
+        )
+        self.assertEqual(self.get_feed(), [])
+
+    @mock.patch('posts.timeline.FANOUT_LIMIT', 0)
+    def test_large_fanout_author_merged_on_read(self):
+        """Посты популярного автора подмешиваются при чтении."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists()
+        )
+        self.assertEqual(self.get_feed(), ['Новый пост', self.old_post.text])
+
+    @mock.patch('posts.timeline.FANOUT_LIMIT', 1)
+    def test_crossing_fanout_limit_switches_timelines(self):
+        """Автор, пересекший порог, переводит ленты в другой режим."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        run_pending()
+        entries = TimelineEntry.objects.filter(post__author=self.author)
+        self.assertEqual(entries.count(), 1)
+
+        # Второй подписчик делает автора популярным: пока задача ждёт,
+        # разложенный пост и подмешанные не дублируются.
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.author)
+        Post.objects.create(text='Популярный пост', author=self.author)
+        self.assertEqual(
+            self.get_feed(), ['Популярный пост', self.old_post.text]
+        )
+        run_pending()
+        self.assertFalse(entries.exists())
+        self.assertEqual(
+            self.get_feed(), ['Популярный пост', self.old_post.text]
+        )
+
+        # Под порогом посты «популярного» периода возвращаются в ленты.
+        Follow.objects.filter(user=fan, author=self.author).delete()
+        run_pending()
+        self.assertEqual(entries.filter(user=self.follower).count(), 2)
+        self.assertEqual(
+            self.get_feed(), ['Популярный пост', self.old_post.text]
+        )
+
+
+class CommentsViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Ответ #{number}')
+            for number in range(COMMENTS_COUNT + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_comments_paginated_by_cursor(self):
+        """Страница поста показывает первую порцию, остальное подгружается."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        self.assertEqual(len(response.context['comments']), COMMENTS_COUNT)
+        more_url = response.context['more_comments_url']
+        self.assertIsNotNone(more_url)
+
+        fragment = self.client.get(more_url)
+        self.assertTemplateUsed(fragment, 'posts/includes/comments.html')
+        self.assertContains(fragment, f'Ответ #{COMMENTS_COUNT + 4}')
+        self.assertNotContains(fragment, 'Ответ #0<')
+        self.assertIsNone(fragment.context['more_comments_url'])
+
+        data = self.client.get(f'{more_url}&format=json').json()
+        self.assertEqual(len(data['comments']), 5)
+        self.assertEqual(data['comments'][0]['author'], self.user.username)
+        self.assertIsNone(data['next'])
+
+    def test_add_comment_returns_fragment(self):
+        """AJAX-запрос получает только разметку нового комментария."""
+        url = reverse('posts:add_comment', args=[self.post.id])
+        ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        response = self.client.post(url, {'text': 'Новый'}, **ajax)
+        self.assertEqual(response.status_code, 201)
+        comment = Comment.objects.latest('id')
+        self.assertEqual(response.json()['id'], comment.id)
+        self.assertIn(f'id="comment-{comment.id}"', response.json()['html'])
+
+        response = self.client.post(url, {'text': ''}, **ajax)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Старое описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def assertRefreshed(self, url, change, text):
+        """После правки страница отдаётся заново и по ETag, и по дате."""
+        yesterday = timezone.now() - timedelta(days=1)
+        Post.objects.update(modified=yesterday)
+        Group.objects.update(modified=yesterday)
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertNotContains(response, text)
+        change()
+        conditions = (
+            {'HTTP_IF_NONE_MATCH': etag},
+            {'HTTP_IF_MODIFIED_SINCE': last_modified},
+        )
+        for headers in conditions:
+            with self.subTest(url=url, headers=headers):
+                self.assertContains(self.client.get(url, **headers), text)
+
+    def assertRevalidates(self, url, change, by_date=True):
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304 if by_date else 200)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed_not_modified_until_new_post(self):
+        """Лента отвечает 304, пока в ней ничего не изменилось."""
+        self.assertRevalidates(
+            reverse('posts:index'),
+            lambda: Post.objects.create(text='Новый', author=self.user),
+            by_date=False,
+        )
+
+    def test_feed_refreshed_after_delete(self):
+        """Удалённый пост пропадает из ленты и при If-Modified-Since."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        ]
+        post = Post.objects.create(
+            text='Удаляемый пост', author=self.user, group=self.group
+        )
+        responses = {url: self.client.get(url) for url in urls}
+        post.delete()
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertContains(response, post.text)
+                self.assertNotContains(
+                    self.client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
                     ),
-                    second_page_count,
+                    post.text,
                 )
+
+    def test_post_detail_not_modified_until_comment(self):
+        """Страница поста отвечает 304 до нового комментария."""
+        self.assertRevalidates(
+            reverse('posts:post_detail', args=[self.post.id]),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.user, text='Ответ'
+            ),
+        )
+
+    def test_edit_moves_last_modified(self):
+        """Правка поста сдвигает Last-Modified страницы."""
+        url = reverse('posts:profile', args=[self.user.username])
+        before = self.client.get(url)['Last-Modified']
+        Post.objects.filter(id=self.post.id).update(
+            modified=self.post.modified + timedelta(days=1)
+        )
+        self.assertNotEqual(self.client.get(url)['Last-Modified'], before)
+
+    def test_group_description_edit_refreshes_page(self):
+        """Правка описания группы обновляет её страницу и ленту."""
+        def edit():
+            self.group.description = 'Новое описание'
+            self.group.save()
+
+        feed = reverse('posts:group_feed', args=[self.group.slug, 'rss'])
+        self.client.get(feed).getvalue()
+        self.assertRefreshed(
+            reverse('posts:group_list', args=[self.group.slug]), edit,
+            'Новое описание',
+        )
+        self.assertIn(
+            'Новое описание', self.client.get(feed).getvalue().decode()
+        )
+
+    def test_author_rename_refreshes_pages(self):
+        """Новое имя автора видно в профиле и его ленте."""
+        def rename():
+            self.user.first_name = 'Лев'
+            self.user.last_name = 'Толстой'
+            self.user.save()
+
+        feed = reverse(
+            'posts:profile_feed', args=[self.user.username, 'atom']
+        )
+        self.client.get(feed).getvalue()
+        self.assertRefreshed(
+            reverse('posts:profile', args=[self.user.username]), rename,
+            'Лев Толстой',
+        )
+        self.assertIn(
+            'Лев Толстой', self.client.get(feed).getvalue().decode()
+        )
+
+    def test_post_detail_refreshed_after_author_and_group_edits(self):
+        """Страница поста обновляется при смене имени автора и группы."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+
+        def rename():
+            self.user.first_name = 'Лев'
+            self.user.last_name = 'Толстой'
+            self.user.save()
+
+        def retitle():
+            self.group.title = 'Новое название'
+            self.group.save()
+
+        self.assertRefreshed(url, rename, 'Лев Толстой')
+        self.assertRefreshed(url, retitle, 'Новое название')
+
+        # ETag следует за именем, даже если запись прошла без сигналов.
+        etag = self.client.get(url)['ETag']
+        User.objects.filter(id=self.user.id).update(last_name='Николаевич')
+        self.assertContains(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag), 'Лев Николаевич'
+        )
+
+    def test_etag_depends_on_user(self):
+        """Разметка зависит от пользователя, и ETag тоже."""
+        url = reverse('posts:index')
+        guest_etag = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+        self.assertNotEqual(self.client.get(url)['ETag'], guest_etag)
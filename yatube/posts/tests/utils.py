@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    """Проверки числа запросов к базе для ``TestCase``."""
+
+    @contextmanager
+    def assertMaxQueries(self, limit):
+        """Не больше ``limit`` запросов внутри блока ``with``."""
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context)
+        if executed > limit:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(context.captured_queries, 1)
+            )
+            self.fail(
+                f'{executed} запросов вместо не более {limit}:\n{queries}'
+            )
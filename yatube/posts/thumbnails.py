@@ -0,0 +1,160 @@
+"""Миниатюры карточек постов, создаваемые вне запроса.
+
+Шаблоны больше не вызывают ``{% thumbnail %}`` напрямую: на холодном
+кэше sorl-thumbnail декодирует и масштабирует исходник прямо во время
+рендера. Вместо этого миниатюры ставятся в очередь задач после записи
+поста (``posts.tasks.schedule_thumbnails``), а шаблон до их появления
+показывает заглушку и сам ничего не ставит. Недостающие миниатюры
+старых постов создаёт ``manage.py generate_thumbnails``.
+
+Кроме основной миниатюры 960x339 создаются варианты нескольких ширин
+в WebP и, если Pillow умеет, в AVIF — для ``<picture>``/``srcset``.
+"""
+import os
+
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings, settings
+from sorl.thumbnail.images import ImageFile
+
+from . import caching
+from .models import Post
+
+
+CARD_WIDTH, CARD_HEIGHT = 960, 339
+CARD_GEOMETRY = f'{CARD_WIDTH}x{CARD_HEIGHT}'
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+WORKERS = 4
+
+VARIANT_WIDTHS = (480, 960, 1440)
+# Форматы в порядке предпочтения; JPEG — запасной для <img>.
+VARIANT_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+VARIANT_QUALITY = {'AVIF': 60, 'WEBP': 75, 'JPEG': 80}
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+
+class CachedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд, умеющий проверить миниатюру, не создавая её."""
+
+    def _normalize(self, source, options):
+        # Те же значения по умолчанию, что в ThumbnailBackend.get_thumbnail,
+        # иначе имя файла миниатюры не совпадёт.
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        if options['format'] in EXTENSIONS:
+            return super()._get_thumbnail_filename(
+                source, geometry_string, options
+            )
+        # sorl-thumbnail не знает AVIF: меняем только расширение.
+        name = super()._get_thumbnail_filename(
+            source, geometry_string, dict(options, format='JPEG')
+        )
+        return '{}.{}'.format(
+            os.path.splitext(name)[0], options['format'].lower()
+        )
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        options = self._normalize(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = CachedThumbnailBackend()
+
+
+def variant_formats():
+    """Форматы вариантов, которые умеет кодировать установленный Pillow."""
+    Image.init()
+    return [fmt for fmt in VARIANT_FORMATS if fmt in Image.SAVE]
+
+
+def variants():
+    """Пары (формат, ширина) с геометрией и опциями sorl-thumbnail."""
+    for fmt in variant_formats():
+        for width in VARIANT_WIDTHS:
+            height = round(width * CARD_HEIGHT / CARD_WIDTH)
+            options = {
+                'crop': 'center',
+                'upscale': False,
+                'format': fmt,
+                'quality': VARIANT_QUALITY[fmt],
+            }
+            yield fmt, width, f'{width}x{height}', options
+
+
+def picture(image):
+    """Готовые варианты картинки по форматам или ``None``, если их нет.
+
+    Возвращает ``{'sources': [...], 'img': миниатюра, 'srcset': ...}``.
+    """
+    card = card_thumbnail(image)
+    if card is None:
+        return None
+    by_format = {}
+    for fmt, width, geometry, options in variants():
+        thumbnail = backend.get_cached_thumbnail(image, geometry, **options)
+        if thumbnail is None:
+            return None
+        by_format.setdefault(fmt, {})[thumbnail.width] = thumbnail
+    srcsets = {
+        fmt: ', '.join(
+            f'{thumbnail.url} {width}w'
+            for width, thumbnail in sorted(thumbnails.items())
+        )
+        for fmt, thumbnails in by_format.items()
+    }
+    return {
+        'sources': [
+            {'type': MIME_TYPES[fmt], 'srcset': srcset}
+            for fmt, srcset in srcsets.items() if fmt != 'JPEG'
+        ],
+        'img': card,
+        'srcset': srcsets['JPEG'],
+    }
+
+
+def card_thumbnail(image):
+    """Готовая миниатюра карточки или ``None``, пока её нет."""
+    if not image:
+        return None
+    return backend.get_cached_thumbnail(image, CARD_GEOMETRY, **CARD_OPTIONS)
+
+
+def generate(name):
+    """Создаёт миниатюры и сбрасывает карточки постов с этой картинкой.
+
+    Возвращает ``True``, если чего-то из них ещё не было.
+    """
+    missing = [
+        (geometry, options)
+        for geometry, options in [(CARD_GEOMETRY, CARD_OPTIONS)] + [
+            (geometry, options) for _, _, geometry, options in variants()
+        ]
+        if not backend.get_cached_thumbnail(name, geometry, **options)
+    ]
+    if not missing:
+        return False
+    for geometry, options in missing:
+        backend.get_thumbnail(name, geometry, **options)
+    posts = Post.objects.filter(image=name)
+    posts.update(version=F('version') + 1, modified=timezone.now())
+    for post in posts.select_related('author'):
+        caching.invalidate_post(post)
+    return True
@@ -0,0 +1,177 @@
+"""Лента подписок, материализованная при записи (fan-out on write).
+
+Новый пост раскладывается в ``TimelineEntry`` каждого подписчика,
+поэтому страница ленты читается диапазоном по индексу
+``(user, pub_date, post)``. Посты авторов с очень большим числом
+подписчиков не раскладываются и подмешиваются при чтении.
+
+Порог ``FANOUT_LIMIT`` проверяется по текущему числу подписчиков, а
+подписка, которая его пересекает, ставит задачу ``switch_mode``:
+автору, ставшему популярным, разложенные посты больше не нужны, и они
+удаляются из лент; автору, вернувшемуся под порог, ленты подписчиков
+дополняются его последними постами, иначе посты, написанные выше
+порога, пропали бы из них. Пока задача ждёт, чтение остаётся верным
+для перехода вверх (посты подмешиваются, копии не дублируются) и
+временно не видит постов «популярного» периода для перехода вниз.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import F, Q
+
+from .models import Follow, Post, Profile, TimelineEntry
+
+
+# Больше подписчиков — посты автора не раскладываются по лентам.
+FANOUT_LIMIT = 1000
+# Сколько последних постов автора попадает в ленту при подписке.
+BACKFILL_LIMIT = 200
+BATCH_SIZE = 500
+
+ORDERING = ('-feed_date', '-feed_post')
+
+
+def is_large_fanout(author):
+    return Profile.objects.filter(
+        user=author, followers_count__gt=FANOUT_LIMIT
+    ).exists()
+
+
+def large_fanout_authors(user):
+    """Авторы из подписок пользователя, чьи посты не раскладываются."""
+    return list(
+        Follow.objects.filter(
+            user=user, author__profile__followers_count__gt=FANOUT_LIMIT
+        ).values_list('author_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_large_fanout(post.author):
+        return
+    followers = Follow.objects.filter(author=post.author).values_list(
+        'user_id', flat=True
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user, author):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if is_large_fanout(author):
+        return
+    posts = Post.objects.filter(author=author).values_list(
+        'id', 'pub_date'
+    ).order_by('-pub_date')[:BACKFILL_LIMIT]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user=user, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def crossed_limit(author_id, followed):
+    """Пересекло ли число подписчиков автора порог последним изменением.
+
+    Вызывается после того, как счётчик подписчиков обновлён.
+    """
+    count = Profile.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    return count == (FANOUT_LIMIT + 1 if followed else FANOUT_LIMIT)
+
+
+def switch_mode(author_id):
+    """Приводит ленты подписчиков к текущему режиму автора."""
+    large = Profile.objects.filter(
+        user_id=author_id, followers_count__gt=FANOUT_LIMIT
+    ).exists()
+    if large:
+        # Посты автора подмешиваются при чтении: копии не нужны.
+        TimelineEntry.objects.filter(post__author_id=author_id).delete()
+        return
+    posts = list(Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date'
+    ).order_by('-pub_date')[:BACKFILL_LIMIT])
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          pub_date=pub_date)
+            for user_id in followers.iterator()
+            for post_id, pub_date in posts
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def rebuild_authors(author_ids):
+    """Дополняет ленты подписчиков ``author_ids``, например после импорта."""
+    for author_id in author_ids:
+        switch_mode(author_id)
+
+
+def prune(user, author):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def follow_feed(user, merged_authors=None):
+    """Посты ленты подписок, упорядочиваемые по ``ORDERING``."""
+    if merged_authors is None:
+        merged_authors = large_fanout_authors(user)
+    if not merged_authors:
+        return Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_post=F('timeline_entries__post'),
+        )
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(id__in=entries) | Q(author_id__in=merged_authors)
+    ).annotate(feed_date=F('pub_date'), feed_post=F('id'))
+
+
+def rebuild():
+    """Заполняет ленты подписок заново, например после массового импорта.
+
+    Возвращает число записей в лентах.
+    """
+    TimelineEntry.objects.all().delete()
+    large = set(
+        Profile.objects.filter(
+            followers_count__gt=FANOUT_LIMIT
+        ).values_list('user_id', flat=True)
+    )
+    follows = Follow.objects.exclude(author_id__in=large).values_list(
+        'author_id', 'user_id'
+    ).order_by('author_id')
+    # Последние посты автора читаются один раз на всех его подписчиков.
+    by_author = groupby(follows.iterator(), key=itemgetter(0))
+    for author_id, rows in by_author:
+        posts = list(Post.objects.filter(author_id=author_id).values_list(
+            'id', 'pub_date'
+        ).order_by('-pub_date')[:BACKFILL_LIMIT])
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(user_id=user_id, post_id=post_id,
+                              pub_date=pub_date)
+                for _, user_id in rows
+                for post_id, pub_date in posts
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+    return TimelineEntry.objects.count()
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, feeds, views
 
 
 app_name = 'posts'
@@ -36,11 +36,21 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='comments'
+    ),
     path(
         'posts/<int:post_id>/',
         views.post_detail,
         name='post_detail'
     ),
+    path(
+        'search/',
+        views.search_posts,
+        name='search'
+    ),
     path(
         'follow/',
         views.follow_index,
@@ -61,4 +71,44 @@ urlpatterns = [
         views.index,
         name='index'
     ),
+    path(
+        'api/posts/',
+        api.index,
+        name='api_index'
+    ),
+    path(
+        'api/posts/<int:post_id>/',
+        api.post_detail,
+        name='api_post_detail'
+    ),
+    path(
+        'api/group/<slug:slug>/',
+        api.group_posts,
+        name='api_group_list'
+    ),
+    path(
+        'api/profile/<str:username>/',
+        api.profile,
+        name='api_profile'
+    ),
+    path(
+        'api/follow/',
+        api.follow_index,
+        name='api_follow_index'
+    ),
+    path(
+        'feed/<slug:fmt>/',
+        feeds.index,
+        name='feed'
+    ),
+    path(
+        'group/<slug:slug>/feed/<slug:fmt>/',
+        feeds.group_posts,
+        name='group_feed'
+    ),
+    path(
+        'profile/<str:username>/feed/<slug:fmt>/',
+        feeds.profile,
+        name='profile_feed'
+    ),
 ]
@@ -1,31 +1,113 @@
+from functools import wraps
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+from core.cache import generation_cache_page, generation_etag, make_etag
+from core.ratelimit import rate_limit
 
+from . import caching, counters, search, timeline
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post
+from .paginators import CursorPaginator
 
 
 DISPLAYED_COUNT = 10
+FEED_ORDERING = ('-pub_date', '-id')
+COMMENTS_COUNT = 20
+COMMENT_ORDERING = ('pub_date', 'id')
 
 User = get_user_model()
 
 
-def makes_paginator(request, obj_list):
+def makes_paginator(request, obj_list, keyset=False, ordering=None):
 
+    if keyset:
+        paginator = CursorPaginator(
+            obj_list, DISPLAYED_COUNT, ordering or FEED_ORDERING
+        )
+        return paginator.get_page(request.GET.get('cursor'))
     paginator = Paginator(obj_list, DISPLAYED_COUNT)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
 
 
-@cache_page(20, key_prefix='index_page')
+def _is_ajax(request):
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+
+def comments_page(request, post):
+    """Страница комментариев поста по курсору из ``?cursor=``."""
+    paginator = CursorPaginator(
+        post.comments.with_authors(), COMMENTS_COUNT, COMMENT_ORDERING
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def _more_comments_url(post, page):
+    if not page.has_next():
+        return None
+    return '{}?cursor={}'.format(
+        reverse('posts:comments', args=[post.id]), page.next_cursor
+    )
+
+
+def _index_feeds(request):
+    return [caching.INDEX_FEED]
+
+
+def _group_feeds(request, slug):
+    return [caching.group_feed(slug)]
+
+
+def _profile_feeds(request, username):
+    return [caching.profile_feed(username)]
+
+
+def _last_modified(posts):
+    return posts.aggregate(last=Max('modified'))['last']
+
+
+def feed_condition(generations, last_modified):
+    """Conditional GET для ленты: ``304`` только по ETag поколений.
+
+    Удаление поста не двигает даты, поэтому If-Modified-Since не
+    проверяется (как в ``api.conditional_json``): Last-Modified из
+    ``last_modified(request, *args, **kwargs)`` — только для сведения.
+    """
+    def decorator(view):
+        conditional = condition(etag_func=generation_etag(generations))(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                date = last_modified(request, *args, **kwargs)
+                if date is not None:
+                    response['Last-Modified'] = http_date(date.timestamp())
+            return response
+        return wrapper
+    return decorator
+
+
+@feed_condition(
+    _index_feeds, lambda request: _last_modified(Post.objects.all())
+)
+@generation_cache_page(_index_feeds)
 def index(request):
 
-    post_list = Post.objects.select_related('group')
+    post_list = Post.objects.feed()
 
-    page_obj = makes_paginator(request, post_list)
+    page_obj = makes_paginator(request, post_list, keyset=True)
     template = 'posts/index.html'
     context = {
         'page_obj': page_obj,
@@ -33,59 +115,136 @@ def index(request):
     return render(request, template, context)
 
 
+def _group_last_modified(request, slug):
+    # Описание группы меняется без правки постов.
+    dates = Group.objects.filter(slug=slug).annotate(
+        last_post=Max('posts__modified')
+    ).values_list('modified', 'last_post').first()
+    if dates is None:
+        return None
+    return max(filter(None, dates))
+
+
+@feed_condition(_group_feeds, _group_last_modified)
+@generation_cache_page(_group_feeds)
 def group_posts(request, slug):
 
     group = get_object_or_404(Group, slug=slug)
 
-    posts = Post.objects.select_related('group')
-    page_obj = makes_paginator(request, posts)
+    posts = Post.objects.for_group(group)
+    page_obj = makes_paginator(request, posts, keyset=True)
     template = 'posts/group_list.html'
     context = {
         'group': group,
-        'posts': posts,
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+@feed_condition(
+    _profile_feeds,
+    lambda request, username: _last_modified(
+        Post.objects.filter(author__username=username)
+    ),
+)
+@generation_cache_page(_profile_feeds)
 def profile(request, username):
 
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
 
-    post_list = Post.objects.filter(author=author)
-    page_obj = makes_paginator(request, post_list)
+    post_list = Post.objects.for_author(author)
+    page_obj = makes_paginator(request, post_list, keyset=True)
+    profile = counters.profile_for(author)
     template = 'posts/profile.html'
+    context = {
+        'page_obj': page_obj,
+        'author': author,
+        'profile': profile,
+        'posts_count': profile.posts_count,
+    }
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
+        context['following'] = Follow.objects.filter(
             user=request.user,
             author=author
         ).exists()
-        context = {
-            'page_obj': page_obj,
-            'author': author,
-            'following': following
-        }
-    else:
-        context = {'page_obj': page_obj, 'author': author}
     return render(request, template, context)
 
 
+def _post_state(request, post_id):
+    # Один запрос по индексам: правка поста, комментарии, счётчик, имя
+    # автора и группа — всё, что показывает страница. Имя и группа
+    # меняются и без правки поста.
+    if not hasattr(request, '_post_state'):
+        request._post_state = Post.objects.filter(id=post_id).annotate(
+            last_comment=Max('comments__pub_date'),
+            comments_total=Count('comments'),
+        ).values_list(
+            'modified', 'last_comment', 'comments_total',
+            'author__profile__posts_count', 'author__username',
+            'author__first_name', 'author__last_name',
+            'group__title', 'group__slug',
+        ).order_by().first()
+    return request._post_state
+
+
+def _post_etag(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    user = request.user.pk if request.user.is_authenticated else None
+    return make_etag(state, user, request.get_full_path())
+
+
+def _post_last_modified(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    return max(filter(None, state[:2]))
+
+
+@condition(etag_func=_post_etag, last_modified_func=_post_last_modified)
 def post_detail(request, post_id):
 
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.detail(), id=post_id)
 
-    posts_count = Post.objects.filter(author=post.author).count()
+    posts_count = counters.profile_for(post.author).posts_count
     form = CommentForm(request.POST or None)
-    comments = post.comments.filter()
+    comments = comments_page(request, post)
     template = 'posts/post_detail.html'
     context = {'post': post,
                'posts_count': posts_count,
                'comments': comments,
+               'more_comments_url': _more_comments_url(post, comments),
                'form': form,
                }
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = comments_page(request, post)
+    more_url = _more_comments_url(post, comments)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'pub_date': comment.pub_date.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next': more_url,
+        })
+    context = {'comments': comments, 'more_comments_url': more_url}
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@rate_limit('post_create', user='10/m', ip='60/m')
 @login_required
 def post_create(request):
 
@@ -97,7 +256,8 @@ def post_create(request):
     if form.is_valid():
         create_post = form.save(commit=False)
         create_post.author = request.user
-        create_post.save()
+        with transaction.atomic():
+            create_post.save()
         return redirect('posts:profile', create_post.author)
     template = 'posts/create_post.html'
     context = {'form': form}
@@ -113,16 +273,19 @@ def post_edit(request, post_id):
         return redirect('posts:post_detail', post_id)
     form = PostForm(
         request.POST or None,
+        files=request.FILES or None,
         instance=edit_post,
     )
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
         return redirect('posts:post_detail', post_id)
     template = 'posts/create_post.html'
     context = {'form': form, 'is_edit': True}
     return render(request, template, context)
 
 
+@rate_limit('add_comment', user='30/m', ip='120/m')
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -131,18 +294,44 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
+        if _is_ajax(request):
+            # Клиенту нужен только новый комментарий, а не вся страница.
+            html = render_to_string(
+                'posts/includes/comment.html', {'comment': comment}, request
+            )
+            return JsonResponse({'id': comment.id, 'html': html}, status=201)
+    elif _is_ajax(request):
+        return JsonResponse({'errors': form.errors}, status=400)
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = makes_paginator(
+        request, search.search(query), keyset=True, ordering=search.ORDERING
+    )
+    template = 'posts/search.html'
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = makes_paginator(request, posts)
+    posts = timeline.follow_feed(request.user).feed()
+    page_obj = makes_paginator(
+        request, posts, keyset=True, ordering=timeline.ORDERING
+    )
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
 
+# Подписка — GET-ссылка, поэтому считается любой метод.
+@rate_limit('profile_follow', user='30/m', ip='120/m', methods=None)
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
@@ -151,12 +340,14 @@ def profile_follow(request, username):
     elif Follow.objects.filter(user=request.user, author=author).exists():
         return redirect('posts:index')
     else:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
         return redirect('posts:profile', author)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', author)
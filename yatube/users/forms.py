@@ -1,6 +1,8 @@
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from django.contrib.auth import get_user_model
 
+from . import tasks
+
 
 User = get_user_model()
 
@@ -14,3 +16,23 @@ class CreationForm(UserCreationForm):
             'username',
             'email',
         )
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо сброса пароля отправляется из очереди задач, не в запросе."""
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        # Токен в строке очереди не хранится: задача получает только
+        # пользователя и строит ссылку сама при отправке.
+        user_id = context['user'].pk
+        context = {
+            key: value for key, value in context.items()
+            if key not in ('user', 'uid', 'token')
+        }
+        tasks.send_password_reset.enqueue(
+            user_id, to_email, from_email, context,
+            subject_template_name, email_template_name,
+            html_email_template_name,
+        )
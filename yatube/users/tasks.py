@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives
+from django.template import loader
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core.tasks import task
+
+
+User = get_user_model()
+
+
+@task()
+def send_mail(subject, body, from_email, recipients, html=None):
+    message = EmailMultiAlternatives(subject, body, from_email, recipients)
+    if html is not None:
+        message.attach_alternative(html, 'text/html')
+    message.send()
+
+
+@task()
+def send_password_reset(user_id, to_email, from_email, context,
+                        subject_template_name, email_template_name,
+                        html_email_template_name=None):
+    """Письмо сброса пароля; ссылка с токеном строится при отправке."""
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    context = dict(
+        context,
+        user=user,
+        uid=urlsafe_base64_encode(force_bytes(user.pk)),
+        token=default_token_generator.make_token(user),
+    )
+    subject = ''.join(
+        loader.render_to_string(subject_template_name, context).splitlines()
+    )
+    body = loader.render_to_string(email_template_name, context)
+    html = None
+    if html_email_template_name is not None:
+        html = loader.render_to_string(html_email_template_name, context)
+    send_mail(subject, body, from_email, [to_email], html)
@@ -28,6 +28,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым: замеряет запрос вместе с остальными middleware.
+    'core.metrics.MetricsMiddleware',
+    'core.querylog.QueryLogMiddleware',
+    # До SessionMiddleware: запись сессии тоже «прилипает» к основной базе.
+    'core.routers.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,7 +47,9 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендера для core.metrics.
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -57,6 +64,9 @@ TEMPLATES = [
     },
 ]
 
+# Компилировать все шаблоны при старте (см. settings_prod).
+TEMPLATE_WARMUP = False
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
@@ -66,6 +76,25 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения — копии основной базы, которые обновляет
+# manage.py sync_replicas:
+# YATUBE_REPLICAS=/srv/yatube/replica1.sqlite3,/srv/yatube/replica2.sqlite3
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.environ.get('YATUBE_REPLICAS', '').split(',')), 1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{path}?mode=ro',
+        # В тестах реплика — то же подключение, что default.
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает из основной базы.
+REPLICA_PIN_SECONDS = 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -111,8 +140,47 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Доступ к /metrics/ без входа: Authorization: Bearer <токен>.
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+METRICS_SERVER_TIMING = True
+
+# Журнал медленных запросов и поиск N+1 (core.querylog). В тестах
+# StrictQueriesRunner включает NPLUSONE_STRICT: N+1 — ошибка.
+SLOW_QUERY_MS = 100
+NPLUSONE_REPEAT_LIMIT = 5
+NPLUSONE_SAMPLE_RATE = 0.05
+NPLUSONE_STRICT = False
+TEST_RUNNER = 'core.test_runner.StrictQueriesRunner'
+
+# Очередь задач (core.tasks) выполняет команда run_tasks, запущенная
+# рядом с веб-сервером: без неё новые посты не попадают в ленты
+# подписок, а поиск и миниатюры не обновляются. С TASKS_EAGER задачи
+# выполняются сразу при постановке, в запросе.
+TASKS_EAGER = False
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# Кэш, общий для всех воркеров, без внешних сервисов:
+# YATUBE_SHARED_CACHE=/var/cache/yatube/cache.sqlite3
+SHARED_CACHE_PATH = os.environ.get('YATUBE_SHARED_CACHE')
+if SHARED_CACHE_PATH:
+    CACHES['default'] = {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': SHARED_CACHE_PATH,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+
+# Ограничение частоты записей (core.ratelimit). Лимиты по умолчанию
+# заданы у представлений; здесь их можно переопределить, например
+# RATE_LIMITS = {'post_create': {'user': '5/m', 'ip': '30/m'}}.
+RATE_LIMITS = {}
+# Вёдра в кэше общие для воркеров, если кэш общий.
+RATE_LIMIT_STORE = 'cache' if SHARED_CACHE_PATH else 'memory'
+# За прокси: заголовок с адресом клиента, например 'HTTP_X_FORWARDED_FOR'.
+RATE_LIMIT_IP_HEADER = os.environ.get('YATUBE_RATE_LIMIT_IP_HEADER')
@@ -0,0 +1,64 @@
+"""Настройки продакшена: DJANGO_SETTINGS_MODULE=yatube.settings_prod."""
+import copy
+import os
+
+from . import settings as base
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASE_REPLICAS
+
+
+DEBUG = False
+
+# Копии: словари базовых настроек не меняются, поэтому профиль можно
+# импортировать рядом с ними (например, в bench_sqlite).
+DATABASES = copy.deepcopy(base.DATABASES)
+TEMPLATES = copy.deepcopy(base.TEMPLATES)
+
+DATABASES['default'] = {
+    'ENGINE': 'core.db_backends.sqlite3',
+    'NAME': os.environ.get(
+        'YATUBE_DB_PATH', os.path.join(BASE_DIR, 'db.sqlite3')
+    ),
+    # Подключение живёт между запросами воркера: прагмы и разбор схемы
+    # не повторяются на каждом запросе.
+    'CONN_MAX_AGE': 600,
+    'OPTIONS': {
+        # Сколько секунд писатель ждёт блокировку (busy timeout).
+        'timeout': 5,
+        'transaction_mode': 'IMMEDIATE',
+    },
+    # Выполняются core.sqlite.configure_connection при подключении.
+    'PRAGMAS': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        # Отрицательное значение — в КиБ: 64 МБ страниц на подключение.
+        'cache_size': -64000,
+        'mmap_size': 256 * 2 ** 20,
+        'temp_store': 'memory',
+    },
+}
+
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias].update({
+        'CONN_MAX_AGE': 600,
+        'PRAGMAS': {'cache_size': -64000, 'mmap_size': 256 * 2 ** 20},
+    })
+
+# Шаблоны читаются и разбираются один раз на процесс. С явными
+# загрузчиками APP_DIRS должен быть выключен: каталоги приложений
+# подключает app_directories.Loader.
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS'].update({
+    'debug': False,
+    'loaders': [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ],
+})
+# YATUBE_TEMPLATE_WARMUP=1: все шаблоны компилируются при старте воркера
+# (yatube/wsgi.py), а не первым запросом к каждой странице. С
+# gunicorn --preload скомпилированные шаблоны достаются воркерам от
+# мастер-процесса.
+TEMPLATE_WARMUP = os.environ.get('YATUBE_TEMPLATE_WARMUP') == '1'